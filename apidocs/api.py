@@ -0,0 +1,68 @@
+from functools import cache
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.shortcuts import redirect
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import permissions
+from rest_framework.decorators import api_view
+
+from apidocs.services import API_INFO, get_schema
+from django_project.http import is_not_modified
+
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'yaml': 'application/yaml',
+}
+
+
+@swagger_auto_schema(method='get', auto_schema=None)
+@api_view(['GET'])
+def get_api_schema(request, schema_format):
+    """
+    get:
+    Retrieve the OpenAPI schema of the API as JSON or YAML
+
+    The schema is generated once per code version (see the `generate_openapi_schema`
+    command) and served from the stored artifact. Clients may cache it, revalidating
+    with the ETag after OPENAPI_SCHEMA_CACHE_TIMEOUT seconds.
+    """
+
+    content, etag = get_schema(schema_format)
+
+    if is_not_modified(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type=CONTENT_TYPES[schema_format])
+
+    response['ETag'] = etag
+    response['Cache-Control'] = (
+        f'public, max-age={settings.OPENAPI_SCHEMA_CACHE_TIMEOUT}'
+    )
+
+    return response
+
+
+@cache
+def get_swagger_ui_view():
+    # drf_yasg.views pulls in the schema generator, imported on the first visit only
+    from drf_yasg.views import get_schema_view
+
+    # only renders the UI page, which loads the stored schema (SPEC_URL)
+    schema_view = get_schema_view(
+        API_INFO,
+        public=True,
+        permission_classes=(permissions.AllowAny,),
+    )
+
+    return schema_view.with_ui('swagger', cache_timeout=0)
+
+
+def swagger_ui(request, *args, **kwargs):
+    # the schema view would generate the schema on every request, the stored one
+    # is served instead
+    if request.GET.get('format') == 'openapi':
+        return redirect('apidocs:schema', schema_format='json')
+
+    return get_swagger_ui_view()(request, *args, **kwargs)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apidocs.services import (
+    UNKNOWN_CODE_VERSION,
+    generate_schema_files,
+    get_code_version,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate the OpenAPI schema artifacts of the current code version, '
+        'served by /api/v1/swagger/schema.json and .yaml. Run it at deploy time.'
+    )
+
+    def handle(self, *args, **options):
+        version = get_code_version()
+
+        if version == UNKNOWN_CODE_VERSION:
+            raise CommandError(
+                'The code version is unknown, set DJANGO_CODE_VERSION (e.g. to the '
+                'commit hash)'
+            )
+
+        for path in generate_schema_files(version):
+            self.stdout.write(f'Written {path}')
@@ -0,0 +1,117 @@
+import hashlib
+import logging
+import os
+import subprocess
+from functools import cache
+from pathlib import Path
+
+from django.conf import settings
+from drf_yasg import openapi
+
+
+logger = logging.getLogger(__name__)
+
+# without DJANGO_CODE_VERSION nor git, a schema stored under it would outlive deploys
+UNKNOWN_CODE_VERSION = 'unknown'
+
+API_INFO = openapi.Info(
+    title='Swagger docs',
+    default_version='v1',
+    description='API documentation',
+)
+
+# generated schemas of this process, by code version and format: (content, etag)
+_loaded_schemas = {}
+
+
+@cache
+def get_code_version() -> str:
+    """DJANGO_CODE_VERSION, set at deploy time, or the current git commit"""
+
+    if settings.CODE_VERSION:
+        return settings.CODE_VERSION
+
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=settings.BASE_DIR,
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return UNKNOWN_CODE_VERSION
+
+
+def get_schema_path(version, schema_format) -> Path:
+    return Path(settings.OPENAPI_SCHEMA_DIR) / f'schema-{version}.{schema_format}'
+
+
+def render_schemas() -> dict[str, bytes]:
+    # imported on first use, like the generation itself
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    # introspects every view and serializer - slow, done once per code version
+    schema = OpenAPISchemaGenerator(API_INFO).get_schema(request=None, public=True)
+
+    return {
+        'json': OpenAPICodecJson(validators=[]).encode(schema),
+        'yaml': OpenAPICodecYaml(validators=[]).encode(schema),
+    }
+
+
+def generate_schema_files(version) -> list[Path]:
+    """Write the schema artifacts of `version`, removing those of other versions"""
+
+    schema_dir = Path(settings.OPENAPI_SCHEMA_DIR)
+    schema_dir.mkdir(parents=True, exist_ok=True)
+
+    paths = []
+    for schema_format, content in render_schemas().items():
+        path = get_schema_path(version, schema_format)
+        temporary_path = path.with_name(f'.{path.name}.{os.getpid()}')
+
+        # concurrent workers may generate it lazily at the same time
+        temporary_path.write_bytes(content)
+        os.replace(temporary_path, path)
+        paths.append(path)
+
+    for path in schema_dir.glob('schema-*.*'):
+        if path not in paths:
+            path.unlink(missing_ok=True)
+
+    return paths
+
+
+def get_schema(schema_format) -> tuple[bytes, str]:
+    """The schema in `schema_format` and its ETag, generated on the first use"""
+
+    version = get_code_version()
+
+    if version == UNKNOWN_CODE_VERSION and not settings.DEBUG:
+        logger.warning(
+            'The code version is unknown, the OpenAPI schema is generated on every '
+            'request. Set DJANGO_CODE_VERSION.'
+        )
+
+    if settings.DEBUG or version == UNKNOWN_CODE_VERSION:
+        # the code changes without a new version while developing, and an unknown
+        # version is not stored
+        content = render_schemas()[schema_format]
+        return content, get_schema_etag(content)
+    key = (version, schema_format)
+
+    if key not in _loaded_schemas:
+        path = get_schema_path(version, schema_format)
+
+        if not path.exists():
+            generate_schema_files(version)
+
+        content = path.read_bytes()
+        _loaded_schemas[key] = content, get_schema_etag(content)
+
+    return _loaded_schemas[key]
+
+
+def get_schema_etag(content) -> str:
+    return f'"{hashlib.sha256(content).hexdigest()[:32]}"'
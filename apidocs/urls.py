@@ -0,0 +1,10 @@
+from django.urls import re_path
+
+from apidocs.api import get_api_schema
+
+
+app_name = 'apidocs'
+
+urlpatterns = [
+    re_path(r'^schema\.(?P<schema_format>json|yaml)$', get_api_schema, name='schema'),
+]
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from monitoring.metrics import record_cache_lookup
+
+
+def get_token_cache_key(key) -> str:
+    return f'auth-token:{key}'
+
+
+def cache_token_credentials(tokens) -> int:
+    """Put tokens (with their user selected) in the cache, as if they were used"""
+
+    if not settings.TOKEN_CACHE_TIMEOUT:
+        return 0
+
+    credentials = {
+        get_token_cache_key(token.key): (token.user, token) for token in tokens
+    }
+    cache.set_many(credentials, settings.TOKEN_CACHE_TIMEOUT)
+
+    return len(credentials)
+
+
+def invalidate_cached_tokens(user_id) -> None:
+    keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    cache.delete_many([get_token_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication which caches the user and token for TOKEN_CACHE_TIMEOUT
+    seconds, sparing the token lookup query on every request. Cached entries are
+    dropped when the user is saved or the token is deleted. Without a shared cache
+    (TOKEN_CACHE_TIMEOUT is 0), every request looks the token up.
+    """
+
+    def authenticate_credentials(self, key):
+        if not settings.TOKEN_CACHE_TIMEOUT:
+            return super().authenticate_credentials(key)
+
+        cache_key = get_token_cache_key(key)
+        credentials = cache.get(cache_key)
+
+        record_cache_lookup('token', hit=credentials is not None)
+
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            cache.set(cache_key, credentials, settings.TOKEN_CACHE_TIMEOUT)
+
+        return credentials
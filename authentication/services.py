@@ -1,15 +1,14 @@
 from attrs import define
 from django.core.exceptions import ImproperlyConfigured
 from django.urls import reverse_lazy
-import jwt
-from oauthlib.common import UNICODE_ASCII_CHARACTER_SET
 from random import SystemRandom
-import requests
 from typing import Dict
 from urllib.parse import urlencode
 
 from django_project import settings
 from exceptions import ApplicationError
+from monitoring.metrics import OUTBOUND_REQUEST_LATENCY
+from monitoring.services import timed
 
 
 @define
@@ -25,6 +24,9 @@ class GoogleAccessTokens:
     access_token: str
 
     def decode_id_token(self) -> Dict[str, str]:
+        # jwt, oauthlib and requests are imported on first use, only the login flow needs them
+        import jwt
+
         id_token = self.id_token
         decoded_token = jwt.decode(jwt=id_token, options={'verify_signature': False})
         return decoded_token
@@ -74,7 +76,10 @@ class GoogleLoginFlowService:
 
     @staticmethod
     # Generates a random state token used to prevent CSRF attacks
-    def _generate_state_session_token(length=30, chars=UNICODE_ASCII_CHARACTER_SET):
+    def _generate_state_session_token(length=30, chars=None):
+        from oauthlib.common import UNICODE_ASCII_CHARACTER_SET
+
+        chars = chars or UNICODE_ASCII_CHARACTER_SET
         rand = SystemRandom()
         state = ''.join(rand.choice(chars) for _ in range(length))
         return state
@@ -111,6 +116,8 @@ class GoogleLoginFlowService:
     # the redirect_uri is necessary for the token exchange request to ensure that it matches the one initially used
 
     def get_tokens(self, *, code: str) -> GoogleAccessTokens:
+        import requests
+
         redirect_uri = self._get_redirect_uri()
 
         # construct the payload for the POST request to obtain the access token from Google
@@ -122,7 +129,8 @@ class GoogleLoginFlowService:
             'grant_type': 'authorization_code',
         }
 
-        response = requests.post(self.GOOGLE_ACCESS_TOKEN_OBTAIN_URL, data=data)
+        with timed('http'), OUTBOUND_REQUEST_LATENCY.labels('google').time():
+            response = requests.post(self.GOOGLE_ACCESS_TOKEN_OBTAIN_URL, data=data)
 
         if not response.ok:
             print(response.text)
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from authentication.backends import get_token_cache_key, invalidate_cached_tokens
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    # cached requests would otherwise see (and save back) the old user
+    invalidate_cached_tokens(instance.id)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    cache.delete(get_token_cache_key(instance.key))
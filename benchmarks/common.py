@@ -0,0 +1,92 @@
+"""Helpers shared by the benchmarks - run them from the project root with `python -m`"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = BASE_DIR / 'benchmarks' / 'results'
+DEFAULT_DATABASE = BASE_DIR / 'benchmarks' / 'bench.sqlite3'
+
+
+def configure_environment(database=DEFAULT_DATABASE, **overrides):
+    """Point the settings at the benchmark database, without DEBUG overhead"""
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_project.settings')
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key')
+    os.environ['DJANGO_DEBUG'] = 'False'
+    os.environ['DJANGO_DATABASE_NAME'] = str(database)
+
+    for name, value in overrides.items():
+        os.environ[name] = str(value)
+
+
+def setup_django(database=DEFAULT_DATABASE, **overrides):
+    configure_environment(database, **overrides)
+
+    import django
+
+    django.setup()
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=BASE_DIR,
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentile(values, percent) -> float:
+    ordered = sorted(values)
+    index = (len(ordered) - 1) * percent / 100
+    lower = int(index)
+    upper = min(lower + 1, len(ordered) - 1)
+
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (index - lower)
+
+
+def summarize_timings(seconds) -> dict:
+    """Latency summary in milliseconds"""
+
+    milliseconds = [value * 1000 for value in seconds]
+
+    return {
+        'count': len(milliseconds),
+        'mean_ms': round(statistics.fmean(milliseconds), 3),
+        'p50_ms': round(percentile(milliseconds, 50), 3),
+        'p95_ms': round(percentile(milliseconds, 95), 3),
+        'p99_ms': round(percentile(milliseconds, 99), 3),
+    }
+
+
+def write_results(benchmark, results, output=None) -> Path:
+    revision = git_revision()
+
+    document = {
+        'benchmark': benchmark,
+        'revision': revision,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+    if output is None:
+        output = RESULTS_DIR / f'{benchmark}-{revision or "unknown"}.json'
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(document, indent=2))
+
+    return output
@@ -0,0 +1,90 @@
+"""
+Benchmark of the response compression on feed pages.
+
+Feed pages of increasing size (shaped like the `get_posts` response) are rendered
+to JSON and compressed with every available encoding at several levels. The CPU
+time per page and the bytes saved are written as JSON to `benchmarks/results/`,
+to pick the levels in COMPRESSION_LEVELS.
+
+    python -m benchmarks.compression_benchmark --likes-per-post 0 20 100
+"""
+
+import argparse
+import sys
+import time
+
+from benchmarks.common import setup_django, summarize_timings, write_results
+from benchmarks.json_benchmark import build_feed_page
+
+
+LEVELS = {
+    'gzip': [1, 6, 9],
+    'br': [1, 4, 6, 11],
+    'zstd': [1, 3, 9, 19],
+}
+
+
+def measure(factory, level, content, iterations) -> dict:
+    timings = []
+    for _ in range(iterations):
+        start = time.process_time()
+        compressor = factory(level)
+        compressed = compressor.compress(content) + compressor.flush()
+        timings.append(time.process_time() - start)
+
+    return {
+        **summarize_timings(timings),
+        'compressed_kb': round(len(compressed) / 1024, 1),
+        'ratio': round(len(content) / len(compressed), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--posts', type=int, default=20)
+    parser.add_argument('--likes-per-post', type=int, nargs='+', default=[0, 20, 100])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--output')
+    options = parser.parse_args()
+
+    setup_django()
+
+    from django_project.middleware import COMPRESSOR_FACTORIES
+    from django_project.renderers import FastJSONRenderer
+
+    results = {}
+
+    for likes_per_post in options.likes_per_post:
+        data = build_feed_page(options.posts, likes_per_post, raw_datetimes=False)
+        content = FastJSONRenderer().render(data)
+
+        page = results[f'{likes_per_post}_likes_per_post'] = {
+            'payload_kb': round(len(content) / 1024, 1),
+            'encodings': {},
+        }
+
+        for encoding, factory in COMPRESSOR_FACTORIES.items():
+            page['encodings'][encoding] = {
+                level: measure(factory, level, content, options.iterations)
+                for level in LEVELS[encoding]
+            }
+
+        print(f'{likes_per_post} likes per post: {page}', file=sys.stderr)
+
+    output = write_results(
+        'compression',
+        {
+            'config': {
+                'posts': options.posts,
+                'iterations': options.iterations,
+                'encodings': list(COMPRESSOR_FACTORIES),
+            },
+            'pages': results,
+        },
+        options.output,
+    )
+    print(f'Results written to {output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""
+End-to-end HTTP benchmark of the API endpoints.
+
+The app is booted in a separate process against a seeded SQLite database, with the
+weather scraper pointed at a local stub server. Every endpoint is driven by a pool
+of clients and the p50/p95/p99 latency, throughput, SQL queries per request and the
+peak RSS of the server are written as JSON to `benchmarks/results/`, named after
+the current commit so runs can be compared.
+
+    python -m benchmarks.http_benchmark --requests 500 --concurrency 4
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from benchmarks.common import (
+    BASE_DIR,
+    DEFAULT_DATABASE,
+    configure_environment,
+    setup_django,
+    summarize_timings,
+    write_results,
+)
+
+
+# name, method, path, JSON body
+ENDPOINTS = [
+    ('feed', 'GET', '/home/', None),
+    ('compact_feed', 'GET', '/home/?compact=true', None),
+    ('submit_post', 'POST', '/posts/', {'content': 'Benchmark post'}),
+    ('switch_like', 'PUT', '/posts/{post_id}/likes/', None),
+    ('post_likes', 'GET', '/posts/{post_id}/likes/', None),
+    ('user_stats', 'GET', '/users/posts/', None),
+    ('update_profile', 'PUT', '/users/profile/', {'description': 'Benchmark'}),
+    ('weather', 'GET', '/weather/?city=sofia', None),
+]
+
+QUERY_COUNT_HEADER = 'X-Benchmark-Queries'
+BENCHMARK_EMAIL = 'benchmark@bench.example.com'
+FORECAST_FIXTURE = BASE_DIR / 'benchmarks' / 'fixtures' / 'forecast.html'
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_forecast_stub() -> str:
+    """Serve the same forecast page for every city, instead of scraping sinoptik.bg"""
+
+    content = FORECAST_FIXTURE.read_bytes()
+
+    class ForecastHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ForecastHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return f'http://127.0.0.1:{server.server_address[1]}/'
+
+
+def serve(port):
+    """Run the app in this process, reporting the SQL queries of every request"""
+
+    setup_django()
+
+    from wsgiref.simple_server import WSGIRequestHandler
+
+    from django.core.servers.basehttp import ThreadedWSGIServer
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connection
+
+    application = get_wsgi_application()
+
+    def counting_application(environ, start_response):
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        def counting_start_response(status, headers, exc_info=None):
+            # non-streaming responses are complete by the time they are started
+            headers.append((QUERY_COUNT_HEADER, str(queries)))
+            return start_response(status, headers, exc_info)
+
+        with connection.execute_wrapper(count_query):
+            return application(environ, counting_start_response)
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', port), QuietHandler)
+    server.set_app(counting_application)
+    server.serve_forever()
+
+
+def prepare_database(options) -> dict:
+    setup_django(options.database)
+
+    from django.core.management import call_command
+    from django.db import connections
+    from rest_framework.authtoken.models import Token
+
+    from posts.models import Post
+    from users.models import User
+
+    call_command('migrate', verbosity=0)
+
+    if options.reseed or not User.objects.filter(username='seed-0').exists():
+        call_command(
+            'seed_scale',
+            clear=True,
+            users=options.users,
+            posts=options.posts,
+            likes=options.likes,
+            activities=options.posts,
+            seed=options.seed,
+            stdout=sys.stderr,
+        )
+
+    user, _ = User.objects.get_or_create(
+        email=BENCHMARK_EMAIL,
+        defaults={'username': 'benchmark', 'is_sandboxed': False},
+    )
+    token, _ = Token.objects.get_or_create(user=user)
+
+    # the most liked seeded post - the newest one
+    post_id = (
+        Post.objects.filter(is_deleted=False)
+        .order_by('-id')
+        .values_list('id', flat=True)[0]
+    )
+
+    connections.close_all()
+
+    return {'token': token.key, 'post_id': post_id}
+
+
+def wait_for_server(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('The benchmark server exited during startup.')
+
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+
+    raise RuntimeError('The benchmark server did not start in time.')
+
+
+def run_endpoint(base_url, token, method, path, body, count, concurrency) -> dict:
+    import requests
+
+    local = threading.local()
+    headers = {'Authorization': f'Token {token}'}
+
+    def call(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+
+        start = time.perf_counter()
+        response = session.request(method, base_url + path, json=body, headers=headers)
+        elapsed = time.perf_counter() - start
+
+        queries = int(response.headers.get(QUERY_COUNT_HEADER, 0))
+        return elapsed, response.status_code, queries
+
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, range(count)))
+
+    wall_time = time.perf_counter() - start
+
+    latencies = [elapsed for elapsed, _, _ in results]
+    statuses = Counter(status for _, status, _ in results)
+    queries = [query_count for _, _, query_count in results]
+
+    return {
+        **summarize_timings(latencies),
+        'throughput_rps': round(count / wall_time, 2),
+        'queries_per_request': round(sum(queries) / count, 2),
+        'errors': sum(total for status, total in statuses.items() if status >= 400),
+        'status_codes': {str(status): total for status, total in statuses.items()},
+    }
+
+
+def get_peak_rss_kb() -> int | None:
+    try:
+        import resource
+    except ImportError:
+        # not available on Windows
+        return None
+
+    # the server is the only child process which was waited for
+    peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in bytes on macOS, in kilobytes elsewhere
+    return peak_rss // 1024 if sys.platform == 'darwin' else peak_rss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument(
+        '--endpoints',
+        nargs='+',
+        choices=[name for name, *_ in ENDPOINTS],
+        default=[name for name, *_ in ENDPOINTS],
+    )
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--posts', type=int, default=100_000)
+    parser.add_argument('--likes', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reseed', action='store_true')
+    parser.add_argument('--database', type=Path, default=DEFAULT_DATABASE)
+    parser.add_argument('--output', type=Path)
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.serve:
+        serve(options.serve)
+        return
+
+    forecast_url = start_forecast_stub()
+    configure_environment(options.database, DJANGO_FORECAST_BASE_URL=forecast_url)
+    context = prepare_database(options)
+
+    port = get_free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.http_benchmark', '--serve', str(port)],
+        cwd=BASE_DIR,
+        env=os.environ.copy(),
+    )
+
+    results = {}
+
+    try:
+        wait_for_server(port, server)
+        base_url = f'http://127.0.0.1:{port}'
+
+        for name, method, path, body in ENDPOINTS:
+            if name not in options.endpoints:
+                continue
+
+            path = path.format(**context)
+            arguments = (base_url, context['token'], method, path, body)
+
+            run_endpoint(*arguments, options.warmup, options.concurrency)
+            results[name] = {
+                'method': method,
+                'path': path,
+                **run_endpoint(*arguments, options.requests, options.concurrency),
+            }
+            print(f'{name}: {results[name]}', file=sys.stderr)
+
+    finally:
+        server.terminate()
+        server.wait()
+
+    output = write_results(
+        'http',
+        {
+            'config': {
+                'requests': options.requests,
+                'concurrency': options.concurrency,
+                'users': options.users,
+                'posts': options.posts,
+                'likes': options.likes,
+                'seed': options.seed,
+            },
+            'endpoints': results,
+            'server_peak_rss_kb': get_peak_rss_kb(),
+        },
+        options.output,
+    )
+    print(f'Results written to {output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
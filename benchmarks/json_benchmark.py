@@ -0,0 +1,130 @@
+"""
+Micro-benchmark of the JSON renderers on feed pages.
+
+A page of posts shaped like the `get_posts` response is rendered with DRF's
+JSONRenderer and with FastJSONRenderer. The render time percentiles and the memory
+allocated per render are written as JSON to `benchmarks/results/`, after checking
+that both renderers produce the same bytes.
+
+    python -m benchmarks.json_benchmark --posts 100 --likes-per-post 20
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import setup_django, summarize_timings, write_results
+
+
+def build_feed_page(posts, likes_per_post, raw_datetimes) -> dict:
+    """
+    The serialized feed page. With `raw_datetimes`, `created_at` is left as a
+    datetime, so it goes through the encoder fallback of the renderers.
+    """
+
+    created_at = datetime(2024, 6, 30, 14, 6, 59, 700338, tzinfo=timezone.utc)
+
+    def user(user_id):
+        return {
+            'id': user_id,
+            'email': f'user-{user_id}@example.com',
+            'profile_picture_thumbnails': {
+                '48': {
+                    'webp': f'/media/ab/cd/{user_id:064x}.webp',
+                    'jpg': f'/media/ab/cd/{user_id:064x}.jpg',
+                },
+            },
+        }
+
+    page = []
+    for post_id in range(posts, 0, -1):
+        timestamp = created_at - timedelta(minutes=post_id)
+        page.append(
+            {
+                'id': post_id,
+                'author': user(post_id % 97),
+                'content': f'Post {post_id} - Здравей, свят! ☀️ {"lorem ipsum " * 10}',
+                'created_at': (
+                    timestamp
+                    if raw_datetimes
+                    else timestamp.isoformat().replace('+00:00', 'Z')
+                ),
+                'liked_users': [
+                    user((post_id * 7919 + like * 104729) % 10_000)
+                    for like in range(likes_per_post)
+                ],
+            }
+        )
+
+    return {'posts': page, 'has_next': True}
+
+
+def measure(renderer, data, iterations) -> dict:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        renderer.render(data)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    renderer.render(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {**summarize_timings(timings), 'peak_allocated_kb': round(peak / 1024, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--posts', type=int, default=100)
+    parser.add_argument('--likes-per-post', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--output')
+    options = parser.parse_args()
+
+    setup_django()
+
+    from rest_framework.renderers import JSONRenderer
+
+    from django_project.renderers import FastJSONRenderer, orjson
+
+    if orjson is None:
+        parser.error('orjson is not installed, FastJSONRenderer would fall back')
+
+    results = {}
+
+    for variant, raw_datetimes in [('serialized', False), ('raw_datetimes', True)]:
+        data = build_feed_page(options.posts, options.likes_per_post, raw_datetimes)
+        reference, fast = JSONRenderer(), FastJSONRenderer()
+
+        if reference.render(data) != fast.render(data):
+            raise SystemExit(f'The renderers disagree on the {variant} page')
+
+        results[variant] = {
+            'payload_kb': round(len(reference.render(data)) / 1024, 1),
+            'drf': measure(reference, data, options.iterations),
+            'fast': measure(fast, data, options.iterations),
+        }
+        print(f'{variant}: {results[variant]}', file=sys.stderr)
+
+    output = write_results(
+        'json',
+        {
+            'config': {
+                'posts': options.posts,
+                'likes_per_post': options.likes_per_post,
+                'iterations': options.iterations,
+                'orjson': orjson.__version__,
+            },
+            'pages': results,
+        },
+        options.output,
+    )
+    print(f'Results written to {output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark of the per-request middleware overhead.
+
+A trivial view is requested through a Django request handler with the current
+MIDDLEWARE, where API paths skip the session middleware, and with the session
+middleware inlined in MIDDLEWARE like before. The latency percentiles of an API
+path and of a session path are written as JSON to `benchmarks/results/`.
+
+    python -m benchmarks.middleware_benchmark --requests 5000
+"""
+
+import argparse
+import sys
+import time
+
+from benchmarks.common import setup_django, summarize_timings, write_results
+
+
+def ping(request):
+    from django.http import HttpResponse
+
+    return HttpResponse('pong')
+
+
+# this module is also the URLconf of the benchmark
+urlpatterns = []
+
+
+def get_chains() -> dict:
+    from django.conf import settings
+
+    router = 'django_project.middleware.SessionRoutesMiddleware'
+    index = settings.MIDDLEWARE.index(router)
+
+    return {
+        'inline': (
+            settings.MIDDLEWARE[:index]
+            + settings.SESSION_MIDDLEWARE
+            + settings.MIDDLEWARE[index + 1 :]
+        ),
+        'routed': settings.MIDDLEWARE,
+    }
+
+
+def build_handler(middleware):
+    from django.core.handlers.base import BaseHandler
+    from django.test import override_settings
+
+    with override_settings(MIDDLEWARE=middleware):
+        handler = BaseHandler()
+        handler.load_middleware()
+
+    return handler
+
+
+def measure(handlers, paths, count, rounds=10) -> dict:
+    """Time every handler on every path, interleaved in rounds to even out noise"""
+
+    from django.test import RequestFactory
+
+    factory = RequestFactory()
+    timings = {(name, path): [] for name in handlers for path in paths}
+
+    for _ in range(rounds):
+        for (name, path), samples in timings.items():
+            handler = handlers[name]
+
+            for _ in range(count // rounds):
+                request = factory.get(path)
+                start = time.perf_counter()
+                handler.get_response(request).close()
+                samples.append(time.perf_counter() - start)
+
+    return {key: summarize_timings(samples) for key, samples in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--output')
+    options = parser.parse_args()
+
+    # no sampled timing logs, they would dominate a trivial view
+    setup_django(DJANGO_REQUEST_TIMING_SAMPLE_RATE=0)
+
+    from django.test import override_settings
+    from django.urls import path
+
+    urlpatterns.extend(
+        [
+            path('api/ping/', ping),
+            path('admin/ping/', ping),
+        ]
+    )
+
+    chains = get_chains()
+    paths = {'api_path': '/api/ping/', 'session_path': '/admin/ping/'}
+
+    with override_settings(ROOT_URLCONF=__name__):
+        handlers = {
+            name: build_handler(middleware) for name, middleware in chains.items()
+        }
+
+        # warm up
+        measure(handlers, paths.values(), len(handlers) * 100)
+        timings = measure(handlers, paths.values(), options.requests)
+
+    results = {}
+    for name, middleware in chains.items():
+        results[name] = {'middleware': list(middleware)}
+
+        for label, url in paths.items():
+            results[name][label] = timings[name, url]
+            print(f'{name} chain, {url}: {timings[name, url]}', file=sys.stderr)
+
+    output = write_results(
+        'middleware',
+        {'config': {'requests': options.requests}, 'chains': results},
+        options.output,
+    )
+    print(f'Results written to {output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark of the process startup.
+
+Fresh interpreters are started to measure the import time of the app up to a
+loaded URLconf (`python -X importtime`, with the slowest top-level imports), the
+time to the first response of the WSGI application and the duration of
+`manage.py check`. The medians are written as JSON to `benchmarks/results/`.
+
+    python -m benchmarks.startup_benchmark --repeat 5
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import BASE_DIR, configure_environment, write_results
+
+
+LOAD_URLCONF = """
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+"""
+
+FIRST_RESPONSE = """
+from wsgiref.util import setup_testing_defaults
+from django.core.wsgi import get_wsgi_application
+
+environ = {'PATH_INFO': '/metrics', 'HTTP_HOST': 'localhost'}
+setup_testing_defaults(environ)
+statuses = []
+get_wsgi_application()(environ, lambda status, headers: statuses.append(status))
+assert statuses[0].startswith('200'), statuses
+"""
+
+
+def run(arguments) -> tuple[float, str]:
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, *arguments],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    return time.perf_counter() - start, process.stderr
+
+
+def parse_importtime(output) -> dict[str, tuple[int, int]]:
+    """Self and cumulative microseconds of the top-level imports, by module"""
+
+    imports = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+
+        self_time, cumulative_time, module = line[len('import time:') :].split('|')
+        if not module.startswith('  '):
+            imports[module.strip()] = int(self_time), int(cumulative_time)
+
+    return imports
+
+
+def measure_imports(repeat, top) -> dict:
+    totals = []
+    slowest = {}
+
+    for _ in range(repeat):
+        _, output = run(['-X', 'importtime', '-c', LOAD_URLCONF])
+        imports = parse_importtime(output)
+
+        totals.append(sum(cumulative for _, cumulative in imports.values()))
+        for module, (_, cumulative) in imports.items():
+            slowest.setdefault(module, []).append(cumulative)
+
+    medians = {module: statistics.median(times) for module, times in slowest.items()}
+    ranked = sorted(medians.items(), key=lambda item: item[1], reverse=True)
+
+    return {
+        'total_ms': round(statistics.median(totals) / 1000, 1),
+        'slowest_top_level_ms': {
+            module: round(microseconds / 1000, 1)
+            for module, microseconds in ranked[:top]
+        },
+    }
+
+
+def measure_command(arguments, repeat) -> dict:
+    durations = [run(arguments)[0] for _ in range(repeat)]
+
+    return {
+        'median_ms': round(statistics.median(durations) * 1000, 1),
+        'min_ms': round(min(durations) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--output')
+    options = parser.parse_args()
+
+    configure_environment()
+
+    results = {
+        'imports': measure_imports(options.repeat, options.top),
+        'first_response': measure_command(['-c', FIRST_RESPONSE], options.repeat),
+        'manage_py_check': measure_command(['manage.py', 'check'], options.repeat),
+    }
+    print(results, file=sys.stderr)
+
+    output = write_results(
+        'startup', {'config': {'repeat': options.repeat}, **results}, options.output
+    )
+    print(f'Results written to {output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
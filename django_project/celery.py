@@ -10,9 +10,24 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
 
+# export the task durations to /metrics
+import monitoring.signals  # noqa: E402, F401
+
 app.conf.beat_schedule = {
     'delete-old-posts-every-5-minutes': {
         'task': 'posts.tasks.delete_old_posts',
         'schedule': 30.0,  # Every 30 seconds for testing
     },
+    'expire-data-exports-every-hour': {
+        'task': 'users.tasks.expire_data_exports',
+        'schedule': 60.0 * 60,
+    },
+    'collect-orphaned-media-every-hour': {
+        'task': 'users.tasks.collect_orphaned_media',
+        'schedule': 60.0 * 60,
+    },
+    'prune-slow-queries-every-day': {
+        'task': 'monitoring.tasks.prune_slow_queries',
+        'schedule': 60.0 * 60 * 24,
+    },
 }
@@ -0,0 +1,29 @@
+import hashlib
+
+from django.utils.http import parse_etags, quote_etag
+
+
+def make_etag(*parts) -> str:
+    """A strong ETag of the versions a response is built from"""
+
+    digest = hashlib.sha1('\0'.join(map(str, parts)).encode()).hexdigest()
+
+    return quote_etag(digest)
+
+
+def is_not_modified(request, etag) -> bool:
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+
+    # weak comparison, the compression middleware weakens the ETag
+    return bool(if_none_match) and etag in [
+        value.removeprefix('W/') for value in parse_etags(if_none_match)
+    ]
+
+
+def set_private_etag(response, etag):
+    """Let the client revalidate a per-user response with its ETag on every use"""
+
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+
+    return response
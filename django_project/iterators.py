@@ -0,0 +1,9 @@
+from itertools import islice
+
+
+def batched(iterable, size):
+    """Lists of `size` items of the iterable (the last one may be shorter)"""
+
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
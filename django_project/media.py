@@ -0,0 +1,182 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils.http import parse_etags, quote_etag
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+
+
+# names given by ContentAddressedStorage, their content never changes
+CONTENT_HASHED_NAME = re.compile(
+    r'^[0-9a-f]{2}/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})\.\w+$'
+)
+RANGE_HEADER = re.compile(r'^bytes=(?P<start>\d*)-(?P<end>\d*)$')
+
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'private, no-cache'
+
+CHUNK_SIZE = 64 * 1024
+
+
+def get_media_path(name) -> str:
+    # files starting with a dot (e.g. uploads in progress) are never served
+    if any(part.startswith('.') for part in name.split('/')):
+        raise Http404()
+
+    try:
+        path = default_storage.path(name)
+    except SuspiciousFileOperation:
+        raise Http404()
+
+    if not os.path.isfile(path):
+        raise Http404()
+
+    return path
+
+
+def get_media_etag(name, stat) -> str:
+    match = CONTENT_HASHED_NAME.match(name)
+
+    if match:
+        return quote_etag(match['digest'])
+
+    return quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+
+
+def parse_range(range_header, size) -> tuple[int, int]:
+    """Parse a single `bytes=start-end` range into inclusive offsets"""
+
+    match = RANGE_HEADER.match(range_header.strip())
+
+    if not match or not (match['start'] or match['end']):
+        raise ValueError('Unsupported range')
+
+    if not match['start']:
+        # suffix range - the last N bytes
+        length = int(match['end'])
+        if length == 0:
+            raise ValueError('Unsatisfiable range')
+        return max(size - length, 0), size - 1
+
+    start = int(match['start'])
+    end = int(match['end']) if match['end'] else size - 1
+
+    if start >= size or end < start:
+        raise ValueError('Unsatisfiable range')
+
+    return start, min(end, size - 1)
+
+
+def iter_file_range(file, start, length):
+    with file:
+        file.seek(start)
+
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+
+            length -= len(chunk)
+            yield chunk
+
+
+def build_offloaded_response(name, path) -> HttpResponse:
+    """Let the front server send the file, the response body stays empty"""
+
+    response = HttpResponse()
+
+    if settings.MEDIA_SENDFILE_BACKEND == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = quote(
+            f'{settings.MEDIA_ACCEL_REDIRECT_PREFIX}{name}'
+        )
+    else:
+        response['X-Sendfile'] = path
+
+    # the front server fills in the real content type otherwise
+    del response['Content-Type']
+
+    return response
+
+
+def build_streamed_response(request, path, stat, etag):
+    size = stat.st_size
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+
+    # ranges only apply to the version of the file the client already has
+    if range_header and (not if_range or if_range == etag):
+        try:
+            start, end = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            iter_file_range(open(path, 'rb'), start, length), status=206
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+        return response
+
+    # FileResponse uses wsgi.file_wrapper, which lets the server use sendfile()
+    return FileResponse(open(path, 'rb'))
+
+
+@swagger_auto_schema(method='get', auto_schema=None)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def serve_media(request, name):
+    """
+    get:
+    Serve an uploaded media file to an authenticated user
+
+    The transfer is handed to the front server via `X-Accel-Redirect` (nginx) or
+    `X-Sendfile` (Apache, lighttpd) when `MEDIA_SENDFILE_BACKEND` is set. Otherwise
+    the file is streamed with support for `Range` requests. Content-addressed files
+    are cached by clients indefinitely, the rest are revalidated by their ETag.
+    """
+
+    path = get_media_path(name)
+    stat = os.stat(path)
+
+    etag = get_media_etag(name, stat)
+    cache_control = (
+        IMMUTABLE_CACHE_CONTROL
+        if CONTENT_HASHED_NAME.match(name)
+        else REVALIDATE_CACHE_CONTROL
+    )
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+
+    if if_none_match and (
+        if_none_match.strip() == '*' or etag in parse_etags(if_none_match)
+    ):
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_SENDFILE_BACKEND:
+        response = build_offloaded_response(name, path)
+    else:
+        response = build_streamed_response(request, path, stat, etag)
+
+        content_type, encoding = mimetypes.guess_type(path)
+        response['Content-Type'] = content_type or 'application/octet-stream'
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+
+    return response
@@ -0,0 +1,236 @@
+import re
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.cache import patch_vary_headers
+from django.utils.module_loading import import_string
+
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class BrotliCompressor:
+    """brotli.Compressor with the compress()/flush() interface of zlib"""
+
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+def get_compressor_factories() -> dict:
+    """Compressor factories by Content-Encoding, in the order they are preferred"""
+
+    factories = {}
+
+    if brotli is not None:
+        factories['br'] = BrotliCompressor
+    if zstandard is not None:
+        factories['zstd'] = lambda level: zstandard.ZstdCompressor(level).compressobj()
+
+    # wbits=31 - gzip container instead of the zlib one
+    factories['gzip'] = lambda level: zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    return factories
+
+
+COMPRESSOR_FACTORIES = get_compressor_factories()
+
+accept_encoding_re = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*')
+
+
+def get_accepted_encodings(accept_encoding) -> set[str]:
+    accepted = set()
+    rejected = set()
+
+    for item in accept_encoding.split(','):
+        match = accept_encoding_re.fullmatch(item)
+        if match is None:
+            continue
+
+        coding, quality = match.group(1).lower(), match.group(2)
+        try:
+            acceptable = quality is None or float(quality) > 0
+        except ValueError:
+            continue
+
+        (accepted if acceptable else rejected).add(coding)
+
+    if '*' in accepted:
+        accepted |= set(COMPRESSOR_FACTORIES) - rejected
+
+    return accepted
+
+
+def compress_stream(chunks, compressor):
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+
+    yield compressor.flush()
+
+
+async def compress_async_stream(chunks, compressor):
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+
+    yield compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with the best encoding the client accepts - brotli or
+    zstd when their packages are installed, gzip otherwise.
+
+    Only the content types listed in COMPRESSION_LEVELS are compressed, with the
+    level configured for each encoding, so images and other already-compressed
+    media are left alone. Responses below COMPRESSION_MIN_SIZE, partial content
+    and responses which already have a Content-Encoding are skipped. Streaming
+    responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if (
+            response.status_code == 206
+            or response.has_header('Content-Encoding')
+            or (
+                not response.streaming
+                and len(response.content) < settings.COMPRESSION_MIN_SIZE
+            )
+        ):
+            return response
+
+        levels = self.get_levels(response.get('Content-Type', ''))
+        if not levels:
+            return response
+
+        accepted = get_accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        encoding = next(
+            (
+                encoding
+                for encoding in COMPRESSOR_FACTORIES
+                if encoding in levels and encoding in accepted
+            ),
+            None,
+        )
+        if encoding is None:
+            return response
+
+        compressor = COMPRESSOR_FACTORIES[encoding](levels[encoding])
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compress_async_stream(
+                    response.streaming_content, compressor
+                )
+            else:
+                response.streaming_content = compress_stream(
+                    response.streaming_content, compressor
+                )
+            del response.headers['Content-Length']
+        else:
+            compressed_content = (
+                compressor.compress(response.content) + compressor.flush()
+            )
+            if len(compressed_content) >= len(response.content):
+                return response
+
+            response.content = compressed_content
+            response.headers['Content-Length'] = str(len(compressed_content))
+
+        # the compressed representation is not byte-for-byte the original one
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+
+        response.headers['Content-Encoding'] = encoding
+
+        return response
+
+    def get_levels(self, content_type) -> dict:
+        media_type = content_type.split(';')[0].strip().lower()
+        return settings.COMPRESSION_LEVELS.get(media_type)
+
+
+class SessionRoutesMiddleware:
+    """
+    Run SESSION_MIDDLEWARE (sessions, CSRF, auth, messages, clickjacking) only
+    for the paths starting with one of SESSION_PATH_PREFIXES - the admin and the
+    Google OAuth flow. Token-authenticated API requests skip them.
+
+    The wrapped middleware is chained the way Django does it, including their
+    process_view() and process_exception() hooks, which Django only collects
+    from the middleware listed in MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.view_hooks = []
+        self.exception_hooks = []
+
+        handler = get_response
+        for middleware_path in reversed(settings.SESSION_MIDDLEWARE):
+            try:
+                middleware = import_string(middleware_path)(handler)
+            except MiddlewareNotUsed:
+                continue
+
+            if hasattr(middleware, 'process_view'):
+                self.view_hooks.insert(0, middleware.process_view)
+            if hasattr(middleware, 'process_exception'):
+                self.exception_hooks.append(middleware.process_exception)
+
+            handler = convert_exception_to_response(middleware)
+
+        self.session_chain = handler
+
+    def __call__(self, request):
+        if self.uses_session(request):
+            return self.session_chain(request)
+
+        return self.get_response(request)
+
+    def uses_session(self, request) -> bool:
+        return request.path_info.startswith(settings.SESSION_PATH_PREFIXES)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.uses_session(request):
+            return None
+
+        for hook in self.view_hooks:
+            response = hook(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+
+    def process_exception(self, request, exception):
+        if not self.uses_session(request):
+            return None
+
+        for hook in self.exception_hooks:
+            response = hook(request, exception)
+            if response is not None:
+                return response
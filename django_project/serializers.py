@@ -1,18 +1,81 @@
+from functools import partial
+
+from django.core.files.storage import default_storage
+from django.urls import reverse
 from rest_framework import serializers
 from posts.models import Post
-from users.models import User
+from users.models import DataExport, User
+
+
+class DynamicFieldsMixin:
+    """
+    Renders only the `fields` passed to the serializer (all by default). Once a
+    selection is made, the nested relations not listed in `expand` are rendered as
+    ids instead (see `expandable_fields`).
+    """
+
+    # nested field name -> factory of the field rendering the relation as ids
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+        if expand is not None:
+            for name, field_factory in self.expandable_fields.items():
+                if name in self.fields and name not in expand:
+                    self.fields[name] = field_factory()
+
+
+def get_field_selection(request, serializer_class) -> tuple[set | None, set | None]:
+    """
+    The comma separated `?fields=` and `?expand=` query parameters of a request,
+    (None, None) without them - the full representation. Raises ValueError for
+    names the serializer does not have.
+    """
 
+    fields = request.GET.get('fields')
+    expand = request.GET.get('expand')
+
+    if fields is None and expand is None:
+        return None, None
+
+    fields = set(fields.split(',')) if fields else None
+    expand = set(expand.split(',')) if expand else set()
+
+    unknown = (fields or set()) - set(serializer_class.Meta.fields)
+    unknown |= expand - set(serializer_class.expandable_fields)
+
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(sorted(unknown))}')
+
+    return fields, expand
+
+
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    profile_picture_thumbnails = serializers.SerializerMethodField()
 
-class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['id', 'email', 'password']
+        fields = ['id', 'email', 'password', 'profile_picture_thumbnails']
         extra_kwargs = {
             'password': {'write_only': True},
         }
 
+    def get_profile_picture_thumbnails(self, user):
+        return {
+            size: {
+                extension: default_storage.url(name)
+                for extension, name in variants.items()
+            }
+            for size, variants in user.profile_picture_thumbnails.items()
+        }
 
-class UserProfileSerializer(serializers.ModelSerializer):
+
+class UserProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['first_name', 'last_name', 'description']
@@ -26,17 +89,58 @@ class ProfilePictureSerializer(serializers.Serializer):
     profile_picture = serializers.ImageField()
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     liked_users = UserSerializer(many=True, read_only=True)
 
+    expandable_fields = {
+        'author': partial(serializers.PrimaryKeyRelatedField, read_only=True),
+        'liked_users': partial(
+            serializers.PrimaryKeyRelatedField,
+            source='likes',
+            many=True,
+            read_only=True,
+        ),
+    }
+
     class Meta:
         model = Post
         fields = ['id', 'author', 'content', 'created_at', 'liked_users']
         read_only_fields = ['id', 'author', 'created_at', 'liked_users']
 
 
+class CompactPostSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """A post without its liked users, see get_feed_queryset(viewer)"""
+
+    author = UserSerializer(read_only=True)
+    like_count = serializers.IntegerField(read_only=True)
+    liked_by_me = serializers.BooleanField(read_only=True)
+
+    expandable_fields = {
+        'author': partial(serializers.PrimaryKeyRelatedField, read_only=True),
+    }
+
+    class Meta:
+        model = Post
+        fields = ['id', 'author', 'content', 'created_at', 'like_count', 'liked_by_me']
+
+
 class SubmitPostSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
         fields = ['content']
+
+
+class DataExportSerializer(serializers.ModelSerializer):
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DataExport
+        fields = ['id', 'status', 'records', 'created_at', 'finished_at', 'url']
+
+    def get_url(self, export):
+        # served to the owner only, never from the media URL
+        if not export.file:
+            return None
+
+        return reverse('users:download_data_export', args=[export.id])
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage which names every file after the SHA-256 of its content.
+
+    Files are stored once under sharded `ab/cd/<hash>.<ext>` paths, so identical
+    uploads share a single file and no directory grows without bound. The original
+    name is only used for its extension.
+
+    Every save() takes a reference to the file and every delete() releases one,
+    the files themselves are removed by the `collect_orphaned_media` task once
+    nothing references them anymore.
+    """
+
+    TEMPORARY_DIRECTORY = '.incoming'
+
+    def get_available_name(self, name, max_length=None):
+        # the final name depends on the content, collisions mean identical files
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()
+
+        temporary_directory = self.path(self.TEMPORARY_DIRECTORY)
+        os.makedirs(temporary_directory, exist_ok=True)
+
+        # hash the upload while streaming it to disk, so it is read only once
+        digest = hashlib.sha256()
+        size = 0
+        fd, temporary_path = tempfile.mkstemp(dir=temporary_directory)
+
+        try:
+            with os.fdopen(fd, 'wb') as destination:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+
+                    digest.update(chunk)
+                    destination.write(chunk)
+                    size += len(chunk)
+
+            hexdigest = digest.hexdigest()
+            name = f'{hexdigest[:2]}/{hexdigest[2:4]}/{hexdigest}{extension}'
+
+            # reference the blob first, so the garbage collector won't remove the
+            # file between the existence check and the return. A new blob row may
+            # follow the collector purging the file, it is always written then.
+            is_new_blob = self._add_reference(name, size)
+
+            full_path = self.path(name)
+
+            if not is_new_blob and os.path.exists(full_path):
+                os.remove(temporary_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                os.replace(temporary_path, full_path)
+
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+
+        return name
+
+    def delete(self, name):
+        if not name:
+            raise ValueError('The name must be given to delete().')
+
+        self._release_reference(name)
+
+    def purge(self, name):
+        """Remove the file from disk, regardless of its references."""
+
+        super().delete(name)
+
+    @staticmethod
+    def _get_blob_model():
+        # resolved lazily, the storage is instantiated before the app registry is ready
+        return apps.get_model('users', 'MediaBlob')
+
+    def _add_reference(self, name, size) -> bool:
+        """Reference the blob, creating it if needed. Returns whether it is new."""
+
+        media_blob = self._get_blob_model()
+
+        while True:
+            # waits for a collector holding the row, and misses it once purged
+            referenced = media_blob.objects.filter(name=name).update(
+                ref_count=F('ref_count') + 1, updated_at=timezone.now()
+            )
+            if referenced:
+                return False
+
+            try:
+                with transaction.atomic():
+                    media_blob.objects.create(name=name, size=size, ref_count=1)
+                return True
+
+            except IntegrityError:
+                # created concurrently, reference that one
+                continue
+
+    def _release_reference(self, name):
+        media_blob = self._get_blob_model()
+
+        media_blob.objects.filter(name=name, ref_count__gt=0).update(
+            ref_count=F('ref_count') - 1, updated_at=timezone.now()
+        )
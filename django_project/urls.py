@@ -1,19 +1,8 @@
 from django.contrib import admin
 from django.urls import include, path
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title='Swagger docs',
-        default_version='v1',
-        description='API documentation',
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+from apidocs.api import swagger_ui
+from django_project.media import serve_media
 
 
 urlpatterns = [
@@ -34,9 +23,12 @@ urlpatterns = [
         '',
         include('forecast.urls', namespace='forecast'),
     ),
+    path('api/v1/swagger/', include('apidocs.urls', namespace='apidocs')),
     path(
         'api/v1/swagger/schema/',
-        schema_view.with_ui('swagger', cache_timeout=0),
+        swagger_ui,
         name='schema-swagger',
     ),
+    path('media/<path:name>', serve_media, name='media'),
+    path('', include('monitoring.urls', namespace='monitoring')),
 ]
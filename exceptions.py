@@ -11,6 +11,11 @@ class UnauthorizedAccessException(PermissionDenied):
         self.message = message
 
 
+class CursorExpiredException(Exception):
+    def __init__(self, message='Cursor expired, reload the feed'):
+        self.message = message
+
+
 class ApplicationError(Exception):
     def __init__(self, message):
         super().__init__(message)
@@ -5,7 +5,7 @@ from rest_framework.permissions import IsAuthenticated
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 
-from forecast.services import get_forecast, get_page_content
+from forecast.services import get_city_forecast
 
 
 @swagger_auto_schema(
@@ -56,7 +56,6 @@ def get_weather_forecast(request):
     city = request.GET.get('city')
     city = ''.join(city.split()).lower() if city else 'sofia'
 
-    soup = get_page_content(city)
-    result = get_forecast(soup)
+    result = get_city_forecast(city)
 
     return Response(result, status=status.HTTP_200_OK)
@@ -1,5 +1,13 @@
-import requests
-from bs4 import BeautifulSoup
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.core.cache import cache
+
+from monitoring.metrics import OUTBOUND_REQUEST_LATENCY, record_cache_lookup
+from monitoring.services import timed
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
 
 CITY_IDS = {
     'sofia': '100727011',
@@ -13,18 +21,24 @@ CITY_IDS = {
     'shumen': '100727233',
     'montana': '100729114',
 }
-BASE_URL = 'https://www.sinoptik.bg/'
 
 
 def get_page_content(city: str):
-    url = BASE_URL + city + '-bulgaria-' + CITY_IDS[city]
-    page = requests.get(url)
+    # imported on first use, most processes never scrape the forecast
+    import requests
+    from bs4 import BeautifulSoup
+
+    url = settings.FORECAST_BASE_URL + city + '-bulgaria-' + CITY_IDS[city]
+
+    with timed('http'), OUTBOUND_REQUEST_LATENCY.labels('sinoptik').time():
+        page = requests.get(url)
+
     soup = BeautifulSoup(page.content, 'html.parser')
 
     return soup
 
 
-def get_forecast(soup: BeautifulSoup):
+def get_forecast(soup: 'BeautifulSoup'):
     curr_temp_title, curr_temp_value = (
         'Температура',
         soup.find('span', {'class': 'wfCurrentTemp'}).string,
@@ -44,3 +58,17 @@ def get_forecast(soup: BeautifulSoup):
             details.pop()
 
     return data
+
+
+def get_city_forecast(city: str) -> dict:
+    # the forecast changes slowly, there is no need to scrape it on every request
+    cache_key = f'forecast:{city}'
+    forecast = cache.get(cache_key)
+
+    record_cache_lookup('forecast', hit=forecast is not None)
+
+    if forecast is None:
+        forecast = get_forecast(get_page_content(city))
+        cache.set(cache_key, forecast, settings.FORECAST_CACHE_TIMEOUT)
+
+    return forecast
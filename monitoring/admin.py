@@ -0,0 +1,116 @@
+from django.contrib import admin
+from django.utils.html import format_html, format_html_join
+
+from monitoring.models import RequestProfile, SlowQuery
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = [
+        'created_at',
+        'method',
+        'view',
+        'status_code',
+        'duration_ms',
+        'slowest_functions',
+    ]
+    list_filter = ['view', 'method']
+    search_fields = ['path', 'view']
+    fields = [
+        'id',
+        'created_at',
+        'method',
+        'path',
+        'view',
+        'status_code',
+        'duration_ms',
+        'requested_by',
+        'file_name',
+        'top_functions_table',
+    ]
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description='Top cumulative functions')
+    def slowest_functions(self, profile):
+        return format_html_join(
+            '',
+            '<div>{} <small>({} ms)</small></div>',
+            (
+                (function['function'], function['cumulative_ms'])
+                for function in profile.top_functions[:3]
+            ),
+        )
+
+    @admin.display(description='Top cumulative functions')
+    def top_functions_table(self, profile):
+        rows = format_html_join(
+            '',
+            '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>',
+            (
+                (
+                    function['cumulative_ms'],
+                    function['total_ms'],
+                    function['calls'],
+                    function['function'],
+                )
+                for function in profile.top_functions
+            ),
+        )
+
+        return format_html(
+            '<table><tr><th>Cumulative ms</th><th>Own ms</th><th>Calls</th>'
+            '<th>Function</th></tr>{}</table>',
+            rows,
+        )
+
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = [
+        'call_site',
+        'short_sql',
+        'calls',
+        'average',
+        'max_ms',
+        'total_ms',
+        'last_seen',
+    ]
+    search_fields = ['sql', 'call_site']
+    fields = [
+        'fingerprint',
+        'call_site',
+        'calls',
+        'total_ms',
+        'max_ms',
+        'first_seen',
+        'last_seen',
+        'formatted_sql',
+        'formatted_explain',
+    ]
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description='SQL')
+    def short_sql(self, query):
+        return query.sql[:120]
+
+    @admin.display(description='Average ms')
+    def average(self, query):
+        return round(query.average_ms, 3)
+
+    @admin.display(description='SQL')
+    def formatted_sql(self, query):
+        return format_html('<pre style="white-space: pre-wrap">{}</pre>', query.sql)
+
+    @admin.display(description='Query plan')
+    def formatted_explain(self, query):
+        return format_html('<pre>{}</pre>', query.explain)
+
+
+admin.site.register(SlowQuery, SlowQueryAdmin)
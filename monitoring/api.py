@@ -0,0 +1,78 @@
+import hmac
+import os
+
+from django.conf import settings
+from django.http import HttpResponse
+from drf_yasg.utils import swagger_auto_schema
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from monitoring.warmup import ready
+
+
+def is_metrics_scraper(request) -> bool:
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+
+    authorization = request.headers.get('Authorization', '')
+    expected = f'Bearer {settings.METRICS_TOKEN}'
+
+    return bool(settings.METRICS_TOKEN) and hmac.compare_digest(
+        authorization.encode(), expected.encode()
+    )
+
+
+@swagger_auto_schema(method='get', auto_schema=None)
+@api_view(['GET'])
+def get_metrics(request):
+    """
+    get:
+    Export the metrics in the Prometheus text format
+
+    With PROMETHEUS_MULTIPROC_DIR set, the samples of all worker processes (and
+    Celery workers on the same host) are aggregated. Only staff users and the
+    Prometheus server, with `Authorization: Bearer <DJANGO_METRICS_TOKEN>`, are
+    let in.
+    """
+
+    if not is_metrics_scraper(request):
+        return Response(
+            {'error': 'Staff user or metrics token required'},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+@swagger_auto_schema(method='get', auto_schema=None)
+@api_view(['GET'])
+def get_readiness(request):
+    """
+    get:
+    Report whether this worker is ready to take traffic
+
+    With DJANGO_WARMUP_ON_STARTUP set, a worker answers 503 until its warm-up is
+    done, so load balancers can gate on this endpoint. The warm-up of a worker is
+    started by its first request, usually this probe.
+    """
+
+    if not ready.is_set():
+        return Response(
+            {'status': 'warming up'}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    return Response({'status': 'ready'})
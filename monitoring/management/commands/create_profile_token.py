@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from monitoring.services import create_profile_token
+
+
+class Command(BaseCommand):
+    help = (
+        'Print a signed token which gets requests profiled when sent in the '
+        'X-Profile-Token header.'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(create_profile_token())
+        self.stderr.write(
+            f'Valid for {settings.REQUEST_PROFILE_TOKEN_MAX_AGE} seconds.'
+        )
@@ -0,0 +1,16 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from monitoring.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        'Warm up the URL resolver, serializers, API schema and the shared caches '
+        '(tokens, forecasts) and print how long every step took. Run it after a '
+        'deploy, before the workers take traffic.'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(json.dumps(warm_up(), indent=2))
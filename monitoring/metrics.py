@@ -0,0 +1,59 @@
+from prometheus_client import Counter, Histogram
+
+
+# With several worker processes, PROMETHEUS_MULTIPROC_DIR has to point to a directory
+# shared by all of them (and emptied before they start). Every process then writes
+# its samples to memory-mapped files there, which the /metrics endpoint aggregates.
+
+REQUESTS = Counter(
+    'django_http_requests_total',
+    'Handled requests by view, method and status code',
+    ['view', 'method', 'status'],
+)
+
+REQUEST_LATENCY = Histogram(
+    'django_http_request_duration_seconds',
+    'Request latency by view',
+    ['view'],
+)
+
+DB_QUERIES = Counter(
+    'django_db_queries_total',
+    'Executed SQL queries by view',
+    ['view'],
+)
+
+CACHE_LOOKUPS = Counter(
+    'app_cache_lookups_total',
+    'Cache lookups by cache and result (hit or miss)',
+    ['cache', 'result'],
+)
+
+TASK_DURATION = Histogram(
+    'celery_task_duration_seconds',
+    'Celery task duration by task and final state',
+    ['task', 'state'],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, float('inf')),
+)
+
+OUTBOUND_REQUEST_LATENCY = Histogram(
+    'outbound_http_request_duration_seconds',
+    'Latency of requests to external services',
+    ['target'],
+)
+
+
+def observe_request(view, method, status, duration, queries):
+    REQUESTS.labels(view, method, status).inc()
+    REQUEST_LATENCY.labels(view).observe(duration)
+    DB_QUERIES.labels(view).inc(queries)
+
+
+def record_cache_lookup(cache, hit):
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def record_cache_lookups(cache, hits, misses):
+    # for the multi-gets, one increment per result instead of per key
+    CACHE_LOOKUPS.labels(cache, 'hit').inc(hits)
+    CACHE_LOOKUPS.labels(cache, 'miss').inc(misses)
@@ -0,0 +1,185 @@
+import cProfile
+import json
+import logging
+import random
+import threading
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection
+from rest_framework.exceptions import AuthenticationFailed
+
+from authentication.backends import CachedTokenAuthentication
+from monitoring.metrics import observe_request
+from monitoring.services import (
+    SlowQueryRecorder,
+    is_profile_token_valid,
+    save_request_profile,
+    start_request_timings,
+    stop_request_timings,
+)
+from monitoring.warmup import start_warm_up
+
+
+logger = logging.getLogger(__name__)
+
+
+class WarmUpMiddleware:
+    """Start the warm-up of this worker process on its first request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start_warm_up()
+        return self.get_response(request)
+
+
+class RequestTimingMiddleware:
+    """
+    Measure where the time of a sampled request goes.
+
+    The total, DB (time and query count), serializer and external HTTP time are
+    added as a `Server-Timing` header and logged as a JSON line keyed by the URL
+    name. Only a `REQUEST_TIMING_SAMPLE_RATE` share of the requests is measured,
+    the rest pass through untouched.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timings, token = start_request_timings()
+        start = perf_counter()
+
+        try:
+            with connection.execute_wrapper(timings.record_query):
+                response = self.get_response(request)
+        finally:
+            stop_request_timings(token)
+
+        total = perf_counter() - start
+        response['Server-Timing'] = timings.as_server_timing(total)
+
+        resolver_match = request.resolver_match
+        logger.info(
+            json.dumps(
+                {
+                    'view': resolver_match.view_name if resolver_match else None,
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'total_ms': round(total * 1000, 3),
+                    **timings.as_log_fields(),
+                }
+            )
+        )
+
+        return response
+
+
+class MetricsMiddleware:
+    """Count every request, its latency and SQL queries per view for /metrics"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        start = perf_counter()
+
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+
+        duration = perf_counter() - start
+
+        # unresolved paths share a label, so 404 scans can't blow up the cardinality
+        resolver_match = request.resolver_match
+        view = resolver_match.view_name if resolver_match else 'unresolved'
+
+        observe_request(view, request.method, response.status_code, duration, queries)
+
+        return response
+
+
+class ProfilerMiddleware:
+    """
+    Run single requests under cProfile, on demand.
+
+    A request is profiled when it carries a valid `X-Profile-Token` header (see
+    the `create_profile_token` command) or, for staff users, the `?profile=1` query
+    flag. The profile is saved to REQUEST_PROFILE_DIR, listed in the admin and its
+    id is returned in the `X-Profile-Id` header.
+    """
+
+    # only one profiler can be active at a time, concurrent requests run unprofiled
+    lock = threading.Lock()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.should_profile(request) or not self.lock.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            profiler = cProfile.Profile()
+            start = perf_counter()
+            response = profiler.runcall(self.get_response, request)
+            duration = perf_counter() - start
+        finally:
+            self.lock.release()
+
+        profile = save_request_profile(request, response, profiler, duration)
+        response['X-Profile-Id'] = str(profile.id)
+
+        return response
+
+    def should_profile(self, request) -> bool:
+        token = request.headers.get('X-Profile-Token')
+        if token:
+            return is_profile_token_valid(token)
+
+        if request.GET.get('profile') != '1':
+            return False
+
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+
+        # API clients authenticate with a token, which DRF checks only in the view
+        try:
+            credentials = CachedTokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return False
+
+        return credentials is not None and credentials[0].is_staff
+
+
+class SlowQueryMiddleware:
+    """
+    Record the SQL statements slower than SLOW_QUERY_THRESHOLD_MS, with their call
+    site and query plan, in the SlowQuery admin table.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = SlowQueryRecorder(settings.SLOW_QUERY_THRESHOLD_MS)
+
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        recorder.save()
+
+        return response
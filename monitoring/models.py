@@ -0,0 +1,49 @@
+import uuid
+
+from django.conf import settings
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    """A cProfile run of a single request, saved by `ProfilerMiddleware`"""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    view = models.CharField(max_length=255, blank=True)
+    method = models.CharField(max_length=10)
+    path = models.TextField()
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    file_name = models.CharField(max_length=255)
+    top_functions = models.JSONField(default=list)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+
+class SlowQuery(models.Model):
+    """SQL statements above SLOW_QUERY_THRESHOLD_MS, aggregated by fingerprint"""
+
+    fingerprint = models.CharField(max_length=40, unique=True)
+    sql = models.TextField()
+    call_site = models.CharField(max_length=255)
+    calls = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    explain = models.TextField(blank=True)
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ['-total_ms']
+
+    @property
+    def average_ms(self):
+        return self.total_ms / self.calls if self.calls else 0
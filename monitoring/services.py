@@ -0,0 +1,275 @@
+import hashlib
+import logging
+import os
+import pstats
+import re
+import sys
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.core import signing
+from django.db import DatabaseError, IntegrityError, connection
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from monitoring.models import RequestProfile, SlowQuery
+
+
+logger = logging.getLogger(__name__)
+
+
+PROFILE_TOKEN_SALT = 'monitoring.profile'
+
+SQL_NORMALIZATION_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s|\?'), '?'),
+    # IN lists differ only in their length
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+# timings of the request being handled, None when it is not instrumented
+_request_timings = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Time spent per category (db, serializer, http) while handling a request"""
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    def add(self, category, seconds):
+        self.durations[category] += seconds
+        self.counts[category] += 1
+
+    def record_query(self, execute, sql, params, many, context):
+        # used as a connection.execute_wrapper()
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('db', perf_counter() - start)
+
+    def as_server_timing(self, total) -> str:
+        metrics = [f'total;dur={total * 1000:.1f}']
+
+        for category, seconds in self.durations.items():
+            metric = f'{category};dur={seconds * 1000:.1f}'
+            if category == 'db':
+                metric += f';desc="{self.counts[category]} queries"'
+            metrics.append(metric)
+
+        return ', '.join(metrics)
+
+    def as_log_fields(self) -> dict:
+        fields = {
+            f'{category}_ms': round(seconds * 1000, 3)
+            for category, seconds in self.durations.items()
+        }
+        fields['db_queries'] = self.counts['db']
+
+        return fields
+
+
+def start_request_timings():
+    timings = RequestTimings()
+    return timings, _request_timings.set(timings)
+
+
+def stop_request_timings(token):
+    _request_timings.reset(token)
+
+
+@contextmanager
+def timed(category):
+    """Add the time spent in the block to the current request timings, if any"""
+
+    timings = _request_timings.get()
+
+    if timings is None:
+        yield
+        return
+
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(category, perf_counter() - start)
+
+
+def create_profile_token() -> str:
+    return signing.TimestampSigner(salt=PROFILE_TOKEN_SALT).sign('profile')
+
+
+def is_profile_token_valid(token) -> bool:
+    signer = signing.TimestampSigner(salt=PROFILE_TOKEN_SALT)
+
+    try:
+        signer.unsign(token, max_age=settings.REQUEST_PROFILE_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+
+    return True
+
+
+def get_top_functions(profiler, limit) -> list[dict]:
+    stats = pstats.Stats(profiler).sort_stats(pstats.SortKey.CUMULATIVE)
+
+    top_functions = []
+    for function in stats.fcn_list[:limit]:
+        _, calls, total_time, cumulative_time, _ = stats.stats[function]
+        top_functions.append(
+            {
+                'function': pstats.func_std_string(function),
+                'calls': calls,
+                'total_ms': round(total_time * 1000, 3),
+                'cumulative_ms': round(cumulative_time * 1000, 3),
+            }
+        )
+
+    return top_functions
+
+
+def save_request_profile(request, response, profiler, duration) -> RequestProfile:
+    profile = RequestProfile(
+        view=request.resolver_match.view_name if request.resolver_match else '',
+        method=request.method,
+        path=request.get_full_path(),
+        status_code=response.status_code,
+        duration_ms=round(duration * 1000, 3),
+        top_functions=get_top_functions(
+            profiler, settings.REQUEST_PROFILE_TOP_FUNCTIONS
+        ),
+    )
+
+    # the raw stats can be opened with pstats, snakeviz etc.
+    os.makedirs(settings.REQUEST_PROFILE_DIR, exist_ok=True)
+    profile.file_name = os.path.join(settings.REQUEST_PROFILE_DIR, f'{profile.id}.prof')
+    profiler.dump_stats(profile.file_name)
+
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        profile.requested_by = user
+
+    profile.save()
+
+    return profile
+
+
+def normalize_sql(sql) -> str:
+    for pattern, replacement in SQL_NORMALIZATION_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+
+    return sql.strip()
+
+
+def get_call_site() -> str:
+    """The innermost project function on the stack, e.g. posts.services.get_all_posts"""
+
+    project_dir = str(settings.BASE_DIR)
+    frame = sys._getframe(1)
+
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        filename = frame.f_code.co_filename
+
+        if (
+            filename.startswith(project_dir)
+            and 'site-packages' not in filename
+            and not module.startswith('monitoring.')
+        ):
+            return f'{module}.{frame.f_code.co_name}'
+
+        frame = frame.f_back
+
+    return 'unknown'
+
+
+class SlowQueryRecorder:
+    """
+    Collects the statements above SLOW_QUERY_THRESHOLD_MS while used as a
+    connection.execute_wrapper(). They are written by `save()`, once the request
+    is done, so the bookkeeping never runs inside the transactions of the app.
+    """
+
+    def __init__(self, threshold_ms):
+        self.threshold_ms = threshold_ms
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        result = execute(sql, params, many, context)
+        duration_ms = (perf_counter() - start) * 1000
+
+        if duration_ms >= self.threshold_ms:
+            self.queries.append(
+                (sql, None if many else params, duration_ms, get_call_site())
+            )
+
+        return result
+
+    def save(self):
+        for sql, params, duration_ms, call_site in self.queries:
+            try:
+                record_slow_query(sql, params, duration_ms, call_site)
+            except DatabaseError:
+                logger.exception('Could not record a slow query')
+
+        self.queries = []
+
+
+def explain_query(sql, params) -> str:
+    # only reads are explained, EXPLAIN of a write may run it on some databases
+    if params is None or not sql.lstrip().upper().startswith('SELECT'):
+        return ''
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            rows = cursor.fetchall()
+    except DatabaseError as error:
+        return f'EXPLAIN failed: {error}'
+
+    return '\n'.join(' '.join(str(column) for column in row) for row in rows)
+
+
+def record_slow_query(sql, params, duration_ms, call_site) -> None:
+    normalized_sql = normalize_sql(sql)
+    fingerprint = hashlib.sha1(normalized_sql.encode()).hexdigest()
+
+    # the latest plan is kept, it changes with the data and the indexes
+    changes = {
+        'call_site': call_site,
+        'explain': explain_query(sql, params),
+        'last_seen': timezone.now(),
+    }
+
+    def update() -> int:
+        return SlowQuery.objects.filter(fingerprint=fingerprint).update(
+            calls=F('calls') + 1,
+            total_ms=F('total_ms') + duration_ms,
+            max_ms=Greatest(F('max_ms'), duration_ms),
+            **changes,
+        )
+
+    if update():
+        return
+
+    try:
+        SlowQuery.objects.create(
+            fingerprint=fingerprint,
+            sql=normalized_sql,
+            calls=1,
+            total_ms=duration_ms,
+            max_ms=duration_ms,
+            **changes,
+        )
+    except IntegrityError:
+        # recorded by a concurrent request in the meantime
+        update()
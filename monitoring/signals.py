@@ -0,0 +1,24 @@
+from time import perf_counter
+
+from celery.signals import task_postrun, task_prerun
+
+from monitoring.metrics import TASK_DURATION
+
+
+# start times of the tasks running in this worker process, by task id
+_task_starts = {}
+
+
+@task_prerun.connect
+def start_task_timer(task_id=None, **kwargs):
+    _task_starts[task_id] = perf_counter()
+
+
+@task_postrun.connect
+def observe_task_duration(task_id=None, task=None, state=None, **kwargs):
+    start = _task_starts.pop(task_id, None)
+
+    if start is not None:
+        TASK_DURATION.labels(task.name, state or 'UNKNOWN').observe(
+            perf_counter() - start
+        )
@@ -0,0 +1,15 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from monitoring.models import SlowQuery
+
+
+@shared_task
+def prune_slow_queries():
+    threshold = timezone.now() - timedelta(seconds=settings.SLOW_QUERY_RETENTION)
+    deleted, _ = SlowQuery.objects.filter(last_seen__lt=threshold).delete()
+
+    print(f'Pruned {deleted} slow queries')
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from monitoring.api import get_metrics, get_readiness
+
+
+app_name = 'monitoring'
+
+urlpatterns = [
+    path('metrics', get_metrics, name='metrics'),
+    path('ready', get_readiness, name='ready'),
+]
@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import threading
+from datetime import timedelta
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.urls import URLResolver, get_resolver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from authentication.backends import cache_token_credentials
+
+
+logger = logging.getLogger(__name__)
+
+# set once the warm-up of this process is done, /ready answers 503 until then
+ready = threading.Event()
+
+# id of the process which started its warm-up, a forked worker starts its own
+_started_pid = None
+_start_lock = threading.Lock()
+
+
+def compile_url_patterns(resolver=None) -> int:
+    resolver = resolver or get_resolver()
+    # builds the reverse lookup tables of this resolver
+    resolver.reverse_dict
+
+    compiled = 0
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex
+        compiled += 1
+
+        if isinstance(pattern, URLResolver):
+            compiled += compile_url_patterns(pattern)
+
+    return compiled
+
+
+def build_serializers() -> int:
+    from django_project.serializers import (
+        CompactPostSerializer,
+        PostSerializer,
+        UserSerializer,
+    )
+
+    return sum(
+        len(serializer().fields)
+        for serializer in (PostSerializer, CompactPostSerializer, UserSerializer)
+    )
+
+
+def load_api_schema() -> int:
+    if settings.DEBUG:
+        # rendered on every request while developing
+        return 0
+
+    from apidocs.services import get_schema
+
+    return len(get_schema('json')[0])
+
+
+def cache_recent_tokens() -> int:
+    """Cache the tokens of the users who logged in recently"""
+
+    since = timezone.now() - timedelta(seconds=settings.WARMUP_TOKEN_ACTIVITY)
+    tokens = (
+        Token.objects.select_related('user')
+        .filter(user__is_active=True, user__last_login__gte=since)
+        .order_by('-user__last_login')[: settings.WARMUP_TOKEN_LIMIT]
+    )
+
+    return cache_token_credentials(tokens)
+
+
+def fetch_forecasts() -> int:
+    from forecast.services import CITY_IDS, get_city_forecast
+
+    for city in CITY_IDS:
+        get_city_forecast(city)
+
+    return len(CITY_IDS)
+
+
+def cache_feed() -> int:
+    """Cache the newest posts of the feed and their rendered JSON"""
+
+    if not settings.FRAGMENT_CACHE_ENABLED:
+        return 0
+
+    from posts.api import render_post_fragments
+    from posts.cache import get_feed_head, get_fragment_keys, get_post_fragments
+    from posts.services import load_feed_head
+
+    posts, _ = get_feed_head(load_feed_head)
+    keys = get_fragment_keys(posts)
+
+    return len(get_post_fragments(keys, render_post_fragments))
+
+
+WARMUP_STEPS = [
+    ('url_patterns', compile_url_patterns),
+    ('serializers', build_serializers),
+    ('api_schema', load_api_schema),
+    ('tokens', cache_recent_tokens),
+    ('forecasts', fetch_forecasts),
+    ('feed', cache_feed),
+]
+
+
+def warm_up() -> dict:
+    """
+    Pay the first-request costs before taking traffic, then mark the process
+    ready. A failing step is logged and skipped, it must not keep the worker down.
+    """
+
+    start = perf_counter()
+    report = {}
+
+    for name, step in WARMUP_STEPS:
+        step_start = perf_counter()
+
+        try:
+            items = step()
+        except Exception:
+            logger.exception(f'Warm-up step {name} failed')
+            items = None
+
+        report[name] = {
+            'items': items,
+            'ms': round((perf_counter() - step_start) * 1000, 3),
+        }
+
+    report['total_ms'] = round((perf_counter() - start) * 1000, 3)
+    ready.set()
+
+    logger.info(json.dumps({'event': 'worker_ready', **report}))
+
+    return report
+
+
+def warm_up_in_background() -> None:
+    try:
+        warm_up()
+    finally:
+        # opened by this thread, no request would close them
+        connections.close_all()
+
+
+def start_warm_up() -> None:
+    """
+    Called by WarmUpMiddleware on every request, starts the warm-up once per
+    process. Threads don't survive a fork, so the warm-up can't be started when
+    the app is loaded: with `gunicorn --preload` that happens in the master and
+    the workers would never get ready. Starting it from the first request (the
+    load balancer's /ready probe) runs it in every worker instead. The warm-up
+    runs in a background thread, /ready answers 503 meanwhile. A worker without
+    warm-up is ready right away.
+    """
+
+    global _started_pid
+
+    pid = os.getpid()
+    if _started_pid == pid:
+        return
+
+    with _start_lock:
+        if _started_pid == pid:
+            return
+
+        _started_pid = pid
+
+        if settings.WARMUP_ON_STARTUP:
+            threading.Thread(
+                target=warm_up_in_background, name='warm-up', daemon=True
+            ).start()
+        else:
+            ready.set()
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from posts.cache import invalidate_feed_head, invalidate_user_stats
 from posts.models import Post
 
 
@@ -11,7 +12,14 @@ class CustomPostsAdmin(admin.ModelAdmin):
 
     @admin.action(description='Restore deleted posts')
     def restore_posts(self, request, queryset):
+        authors = set(queryset.values_list('author_id', flat=True))
         posts_restored = queryset.update(is_deleted=False)
+
+        # update() sends no post_save, see posts/signals.py
+        invalidate_feed_head()
+        for author_id in authors:
+            invalidate_user_stats(author_id)
+
         self.message_user(request, f'{posts_restored} posts restored.')
 
     def get_queryset(self, request):
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
@@ -5,10 +7,34 @@ from rest_framework.permissions import IsAuthenticated
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
-from django_project.serializers import PostSerializer, SubmitPostSerializer
-from posts.services import get_all_posts, remove_post, switch_like_status
-from exceptions import PostNotFoundException, UnauthorizedAccessException
+from django_project.http import is_not_modified, make_etag, set_private_etag
+from django_project.renderers import FastJSONRenderer
+from django_project.serializers import (
+    CompactPostSerializer,
+    PostSerializer,
+    SubmitPostSerializer,
+    UserSerializer,
+    get_field_selection,
+)
+from posts.cache import get_fragment_keys, get_post_fragments
+from posts.services import (
+    get_all_posts,
+    get_feed_changes,
+    get_feed_page,
+    get_post_likes,
+    get_posts_by_id,
+    iter_all_posts,
+    remove_post,
+    save_post,
+    switch_like_status,
+)
+from exceptions import (
+    CursorExpiredException,
+    PostNotFoundException,
+    UnauthorizedAccessException,
+)
 from decorators import log_activity
+from monitoring.services import timed
 
 
 @swagger_auto_schema(
@@ -19,6 +45,10 @@ from decorators import log_activity
         openapi.Parameter(
             'items_per_page', openapi.IN_QUERY, type=openapi.TYPE_INTEGER
         ),
+        openapi.Parameter('stream', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN),
+        openapi.Parameter('compact', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN),
+        openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        openapi.Parameter('expand', openapi.IN_QUERY, type=openapi.TYPE_STRING),
     ],
 )
 @api_view(['GET'])
@@ -38,11 +68,27 @@ def get_posts(request):
 
     **Query Parameters:**
     - pages (`int`): Number of pages to retrieve (default: 1).
-    - items_per_page (`int`): Number of posts per page (default: 20).
+    - items_per_page (`int`): Number of posts per page (default: 20, at most
+                            FEED_MAX_ITEMS_PER_PAGE - larger values are capped).
+    - stream (`bool`): Stream the whole feed instead of a page, as newline-delimited
+                            JSON (`application/x-ndjson`) with one post per line.
+    - compact (`bool`): Return `like_count` and `liked_by_me` for every post instead
+                            of `liked_users`. The users who liked a post are listed
+                            by `/posts/<id>/likes/`.
+    - fields (`str`): Comma separated fields to return for every post (default: all).
+                            Only the data of these fields is read from the database.
+    - expand (`str`): Comma separated relations (author, liked_users) to return in
+                            full once `fields` or `expand` is given, the others are
+                            returned as ids. E.g. `?fields=id,content,author` returns
+                            the author id only.
+
+    With the fragment cache (DJANGO_FRAGMENT_CACHE_URL), pages carry an `ETag`.
+    Sent back in `If-None-Match`, the page is only returned again once it changed.
 
     **Responses:**
     - 200 OK: Returns a paginated list of posts and whether there are more pages to load.
-    - 400 Bad Request: If the provided input for pages or items_per_page is invalid.
+    - 304 Not Modified: If the page did not change since the `If-None-Match` ETag.
+    - 400 Bad Request: If the provided input for pages, items_per_page or fields is invalid.
 
     **Example response on success:**
 
@@ -69,6 +115,21 @@ def get_posts(request):
     }
     """
 
+    viewer = request.user if request.GET.get('compact') in ('1', 'true') else None
+    serializer_class = CompactPostSerializer if viewer else PostSerializer
+
+    try:
+        fields, expand = get_field_selection(request, serializer_class)
+
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if request.GET.get('stream') in ('1', 'true'):
+        return StreamingHttpResponse(
+            stream_posts(settings.FEED_STREAM_CHUNK_SIZE, viewer, fields, expand),
+            content_type='application/x-ndjson',
+        )
+
     pages = request.GET.get('pages', 1)
     items_per_page = request.GET.get('items_per_page', 20)
 
@@ -81,17 +142,201 @@ def get_posts(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    posts, has_next = get_all_posts(pages, items_per_page)
+    if items_per_page < 1:
+        return Response(
+            {'error': 'Invalid input for pages or items per page'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    # bulk consumers should stream the feed instead
+    items_per_page = min(items_per_page, settings.FEED_MAX_ITEMS_PER_PAGE)
+
+    etag = None
+
+    # the fragment keys carry the versions of the posts and authors of the page,
+    # an unchanged page is answered before any post is loaded or serialized
+    if settings.FRAGMENT_CACHE_ENABLED:
+        page, has_next = get_feed_page(pages, items_per_page)
+        keys = get_fragment_keys(page)
+        etag = make_etag(
+            request.accepted_renderer.format,
+            request.GET.urlencode(),
+            viewer.id if viewer else None,
+            has_next,
+            *keys.values(),
+        )
+
+        if is_not_modified(request, etag):
+            return set_private_etag(HttpResponseNotModified(), etag)
+
+        # the full JSON representation is assembled from the cached rendered posts
+        if (
+            viewer is None
+            and fields is None
+            and expand is None
+            and request.accepted_renderer.format == 'json'
+        ):
+            fragments = get_post_fragments(keys, render_post_fragments)
+            response = HttpResponse(
+                render_feed_page(fragments, has_next), content_type='application/json'
+            )
+
+            return set_private_etag(response, etag)
+
+    posts, has_next = get_all_posts(pages, items_per_page, viewer, fields, expand)
 
     # serialize from Django db Model instance to native Python data types
-    posts_serialized = PostSerializer(posts, many=True).data
+    with timed('serializer'):
+        posts_serialized = serializer_class(
+            posts, many=True, fields=fields, expand=expand
+        ).data
 
     data = {
         'posts': posts_serialized,
         'has_next': has_next,
     }
 
-    return Response(data)  # Response() handles JSON rendering
+    # Response() handles JSON rendering
+    if etag is None:
+        return Response(data)
+
+    return set_private_etag(Response(data), etag)
+
+
+@swagger_auto_schema(
+    method='get',
+    tags=['posts'],
+    manual_parameters=[
+        openapi.Parameter('since', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        openapi.Parameter('compact', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN),
+        openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        openapi.Parameter('expand', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+    ],
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_posts_changes(request):
+    """
+    get:
+    Retrieve the changes of the feed since a cursor
+
+    For clients keeping the feed in a local cache. Returns the posts submitted
+    since the cursor, oldest first, and the ids of the older posts deleted since,
+    both at most FEED_MAX_ITEMS_PER_PAGE at a time. Every response has the `cursor` of the next request. Without `since`, only the
+    cursor of the current feed is returned - request it before loading the feed.
+
+    New posts are found by id: a post whose submission commits after the one of a
+    newer post can be missed by a sync that falls in between. Reload the feed
+    from time to time to pick these up.
+
+    **Parameters**:
+    - request (`HttpRequest`): The HTTP request containing the user's authentication token.
+
+    **Query Parameters:**
+    - since (`str`): The `cursor` of the previous response.
+    - compact, fields, expand: The post representation, as for `/home/`.
+
+    **Responses:**
+    - 200 OK: Returns the new posts, the deleted post ids, the next cursor and whether
+      more posts or deletions are waiting (`has_more`, request the next cursor
+      right away).
+    - 400 Bad Request: If the cursor or fields are invalid.
+    - 410 Gone: If the cursor is older than DELETED_POST_TOMBSTONE_RETENTION, the
+      deletions since are no longer known. Reload the feed.
+
+    **Example response on success:**
+
+    {
+    'posts': [
+        {
+        'id': 12,
+        'author': {
+            'id': 1,
+            'email': 'some_user@mail.com'
+        },
+        'content': 'Some content.',
+        'created_at': '2024-06-30T14:06:59.700338Z',
+        'liked_users': []
+        }
+    ],
+    'deleted': [7, 9],
+    'cursor': '12:1719756419700338',
+    'has_more': false
+    }
+
+    **Example response on error:**
+
+    {
+        'error': 'Cursor expired, reload the feed'
+    }
+    """
+
+    viewer = request.user if request.GET.get('compact') in ('1', 'true') else None
+    serializer_class = CompactPostSerializer if viewer else PostSerializer
+
+    try:
+        fields, expand = get_field_selection(request, serializer_class)
+        posts, deleted, cursor, has_more = get_feed_changes(
+            request.GET.get('since'),
+            settings.FEED_MAX_ITEMS_PER_PAGE,
+            viewer,
+            fields,
+            expand,
+        )
+
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    except CursorExpiredException as e:
+        return Response({'error': e.message}, status=status.HTTP_410_GONE)
+
+    with timed('serializer'):
+        posts_serialized = serializer_class(
+            posts, many=True, fields=fields, expand=expand
+        ).data
+
+    data = {
+        'posts': posts_serialized,
+        'deleted': deleted,
+        'cursor': cursor,
+        'has_more': has_more,
+    }
+
+    return Response(data)
+
+
+def render_post_fragments(post_ids) -> dict[int, bytes]:
+    renderer = FastJSONRenderer()
+
+    with timed('serializer'):
+        posts = PostSerializer(get_posts_by_id(post_ids), many=True).data
+
+        return {post['id']: renderer.render(post) for post in posts}
+
+
+def render_feed_page(fragments, has_next) -> bytes:
+    # the same document as Response({'posts': ..., 'has_next': ...})
+    return b''.join(
+        [
+            b'{"posts":[',
+            b','.join(fragments),
+            b'],"has_next":',
+            b'true' if has_next else b'false',
+            b'}',
+        ]
+    )
+
+
+def stream_posts(chunk_size, viewer=None, fields=None, expand=None):
+    # only one chunk of posts is in memory at a time
+    renderer = FastJSONRenderer()
+    serializer_class = CompactPostSerializer if viewer else PostSerializer
+
+    for posts in iter_all_posts(chunk_size, viewer, fields, expand):
+        serializer = serializer_class(posts, many=True, fields=fields, expand=expand)
+
+        for post in serializer.data:
+            yield renderer.render(post) + b'\n'
 
 
 @swagger_auto_schema(method='post', tags=['posts'], request_body=SubmitPostSerializer)
@@ -142,18 +387,64 @@ def submit_post(request):
     serializer = PostSerializer(data=request.data)
 
     if serializer.is_valid():
-        serializer.save(author=request.user)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        save_post(serializer, request.user)
+
+        with timed('serializer'):
+            data = serializer.data
+
+        return Response(data, status=status.HTTP_201_CREATED)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@swagger_auto_schema(
+    method='get',
+    tags=['posts'],
+    manual_parameters=[
+        openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+    ],
+)
 @swagger_auto_schema(method='put', tags=['posts'])
-@api_view(['PUT'])
+@api_view(['GET', 'PUT'])
 @permission_classes([IsAuthenticated])
-@log_activity
-def switch_like(request, post_id):
+def post_likes(request, post_id):
     """
+    get:
+    Retrieve the users who liked a specific post, page by page
+
+    The users are ordered by id. Pass the `next_cursor` of a page as the `cursor`
+    of the next request, it is null on the last page.
+
+    **Parameters**:
+    - request (`HttpRequest`): The HTTP request containing the user's authentication token.
+    - post_id (`int`): The ID of the post.
+
+    **Query Parameters:**
+    - cursor (`int`): Return the users after this one (default: from the start).
+    - limit (`int`): Number of users per page (default: POST_LIKES_PAGE_SIZE, at most
+                            POST_LIKES_MAX_PAGE_SIZE - larger values are capped).
+    - fields (`str`): Comma separated fields to return for every user (default: all).
+
+    **Responses:**
+    - 200 OK: Returns a page of users and the cursor of the next one.
+    - 400 Bad Request: If the provided input for cursor, limit or fields is invalid.
+    - 404 Not Found: If the specified post ID does not exist.
+
+    **Example response on success:**
+
+    {
+    'users': [
+        {
+        'id': 1,
+        'email': 'some_user@mail.com',
+        'profile_picture_thumbnails': {}
+        }
+    ],
+    'next_cursor': 1
+    }
+
     put:
     Toggle user's like status on a specific post
 
@@ -180,6 +471,50 @@ def switch_like(request, post_id):
     }
     """
 
+    if request.method == 'PUT':
+        return switch_like(request, post_id)
+
+    cursor = request.GET.get('cursor')
+    limit = request.GET.get('limit', settings.POST_LIKES_PAGE_SIZE)
+
+    try:
+        cursor = int(cursor) if cursor is not None else None
+        limit = int(limit)
+
+    except ValueError:
+        return Response(
+            {'error': 'Invalid input for cursor or limit'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if limit < 1:
+        return Response(
+            {'error': 'Invalid input for cursor or limit'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    limit = min(limit, settings.POST_LIKES_MAX_PAGE_SIZE)
+
+    try:
+        fields, _ = get_field_selection(request, UserSerializer)
+
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        users, next_cursor = get_post_likes(post_id, cursor, limit, fields)
+
+    except PostNotFoundException as e:
+        return Response({'error': e.message}, status=status.HTTP_404_NOT_FOUND)
+
+    with timed('serializer'):
+        users_serialized = UserSerializer(users, many=True, fields=fields).data
+
+    return Response({'users': users_serialized, 'next_cursor': next_cursor})
+
+
+@log_activity
+def switch_like(request, post_id):
     try:
         res = switch_like_status(post_id, request.user)
         return Response(res, status=status.HTTP_201_CREATED)
@@ -200,7 +535,8 @@ def delete_post(request, post_id):
     The request must include the ID of the post in the URL.
 
     The endpoint marks the post as deleted and triggers a background task which
-    hard deletes all posts that were removed 10+ days ago.
+    hard deletes all posts that were removed more than DELETED_POSTS_RETENTION
+    seconds ago.
 
     **Parameters:**
     - request (`HttpRequest`): The HTTP request containing the user's authentication token.
@@ -0,0 +1,239 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from django_project.iterators import batched
+from monitoring.metrics import record_cache_lookup, record_cache_lookups
+
+
+# see CACHES in the settings, only used once FRAGMENT_CACHE_ENABLED
+FRAGMENT_CACHE = 'fragments'
+
+# the newest posts of the feed, tagged with the feed generation they are current for
+FEED_HEAD_KEY = 'feed:head'
+FEED_GENERATION_KEY = 'feed:generation'
+
+# post versions replaced per set_many() when many posts are invalidated at once
+INVALIDATION_BATCH_SIZE = 1000
+
+
+def get_fragment_cache():
+    return caches[FRAGMENT_CACHE]
+
+
+def post_version_key(post_id) -> str:
+    return f'post:{post_id}:version'
+
+
+def user_version_key(user_id) -> str:
+    return f'user:{user_id}:version'
+
+
+def user_stats_key(user_id) -> str:
+    return f'user:{user_id}:stats'
+
+
+def fragment_key(post_id, post_version, author_version) -> str:
+    return f'post:{post_id}:fragment:{post_version}:{author_version}'
+
+
+def new_version() -> int:
+    # never reuses a version whose key was evicted, its fragments may be cached still
+    return time.time_ns()
+
+
+def get_versions(keys) -> dict:
+    cache = get_fragment_cache()
+    versions = cache.get_many(keys)
+
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+
+    return versions
+
+
+def bump_version(key) -> int:
+    cache = get_fragment_cache()
+
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = new_version()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def invalidate_post_fragment(post_id) -> None:
+    """Drop the cached fragment of a post once the current transaction commits"""
+
+    if settings.FRAGMENT_CACHE_ENABLED:
+        transaction.on_commit(lambda: bump_version(post_version_key(post_id)))
+
+
+def invalidate_post_fragments(post_ids) -> None:
+    """Drop the cached fragments of many posts once the current transaction commits"""
+
+    if settings.FRAGMENT_CACHE_ENABLED:
+        transaction.on_commit(lambda: set_new_post_versions(post_ids))
+
+
+def invalidate_user_fragments(user_id) -> None:
+    """
+    Drop the cached fragments embedding a user once the current transaction
+    commits: the posts by the user (the author) right away, and the posts they
+    liked (the liked users) by the `invalidate_liked_post_fragments` task.
+    """
+
+    def invalidate():
+        from posts.tasks import invalidate_liked_post_fragments
+
+        bump_version(user_version_key(user_id))
+        invalidate_liked_post_fragments.delay(user_id)
+
+    if settings.FRAGMENT_CACHE_ENABLED:
+        transaction.on_commit(invalidate)
+
+
+def invalidate_user_stats(user_id) -> None:
+    """New version of the likes and posts totals of a user, once the transaction commits"""
+
+    if settings.FRAGMENT_CACHE_ENABLED:
+        transaction.on_commit(lambda: bump_version(user_stats_key(user_id)))
+
+
+def get_user_stats_version(user_id) -> int:
+    return get_versions([user_stats_key(user_id)])[user_stats_key(user_id)]
+
+
+def set_new_post_versions(post_ids) -> None:
+    for batch in batched(post_ids, INVALIDATION_BATCH_SIZE):
+        get_fragment_cache().set_many(
+            {post_version_key(post_id): new_version() for post_id in batch},
+            timeout=None,
+        )
+
+
+def invalidate_feed_head() -> None:
+    """Load the feed head again once the current transaction commits"""
+
+    if settings.FRAGMENT_CACHE_ENABLED:
+        transaction.on_commit(lambda: bump_version(FEED_GENERATION_KEY))
+
+
+def get_fragment_keys(posts) -> dict[int, str]:
+    """
+    The fragment keys of the given (post id, author id) pairs, by post id. They
+    embed the current post and author versions, so they also identify the content
+    (a change of a liked user moves the post to a new version).
+    """
+
+    versions = get_versions(
+        [post_version_key(post_id) for post_id, _ in posts]
+        + [user_version_key(author_id) for _, author_id in posts]
+    )
+
+    return {
+        post_id: fragment_key(
+            post_id,
+            versions[post_version_key(post_id)],
+            versions[user_version_key(author_id)],
+        )
+        for post_id, author_id in posts
+    }
+
+
+def get_post_fragments(keys, render) -> list[bytes]:
+    """
+    The rendered JSON of the posts of `keys` (see get_fragment_keys), in their order.
+
+    Fragments are looked up with a single get_many(). The misses are passed to
+    `render(post_ids)`, which returns the fragments by post id, and cached. Posts
+    which `render` skips (e.g. deleted in the meantime) are left out. The keys are
+    read before the posts are, so a fragment never outlives its version.
+    """
+
+    cache = get_fragment_cache()
+
+    fragments = cache.get_many(keys.values())
+    missing = [post_id for post_id, key in keys.items() if key not in fragments]
+    record_cache_lookups(
+        'post_fragment', hits=len(keys) - len(missing), misses=len(missing)
+    )
+
+    if missing:
+        rendered = {
+            keys[post_id]: content for post_id, content in render(missing).items()
+        }
+        cache.set_many(rendered)
+        fragments.update(rendered)
+
+    return [fragments[key] for key in keys.values() if key in fragments]
+
+
+def get_feed_head(load) -> tuple[list[tuple[int, int]], int]:
+    """
+    The newest FEED_CACHED_POSTS posts of the feed as (post id, author id) pairs,
+    and the number of posts in the feed. On a miss, they are returned by `load()`
+    and cached for the current feed generation.
+    """
+
+    cache = get_fragment_cache()
+    cached = cache.get_many([FEED_HEAD_KEY, FEED_GENERATION_KEY])
+    head = cached.get(FEED_HEAD_KEY)
+    generation = cached.get(FEED_GENERATION_KEY)
+
+    if head is not None and head['generation'] == generation:
+        record_cache_lookup('feed', hit=True)
+        return head['posts'], head['count']
+
+    record_cache_lookup('feed', hit=False)
+
+    # read before the posts are, a post submitted meanwhile leaves the head stale
+    if generation is None:
+        generation = get_versions([FEED_GENERATION_KEY])[FEED_GENERATION_KEY]
+
+    posts, count = load()
+    set_feed_head(posts, count, generation)
+
+    return posts, count
+
+
+def set_feed_head(posts, count, generation) -> None:
+    get_fragment_cache().set(
+        FEED_HEAD_KEY,
+        {'generation': generation, 'posts': posts, 'count': count},
+        settings.FEED_CACHE_TIMEOUT,
+    )
+
+
+def update_feed_head(change) -> None:
+    """
+    Apply `change(posts, count)`, which returns the new posts and count, to the
+    cached feed head once the current transaction commits. The change must give
+    the same result when applied twice; it returns None when it cannot, and the
+    head is loaded again.
+
+    Every update moves the feed to a new generation. The head is updated only when
+    it was current for the previous one, e.g. after concurrent updates it is left
+    stale and loaded again by the next request.
+    """
+
+    if not settings.FRAGMENT_CACHE_ENABLED:
+        return
+
+    def update():
+        cache = get_fragment_cache()
+        head = cache.get(FEED_HEAD_KEY)
+        generation = bump_version(FEED_GENERATION_KEY)
+
+        if head is not None and head['generation'] == generation - 1:
+            changed = change(head['posts'], head['count'])
+
+            if changed is not None:
+                set_feed_head(*changed, generation)
+
+    transaction.on_commit(update)
@@ -0,0 +1,222 @@
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from argparse import BooleanOptionalAction
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+
+from django_project.iterators import batched
+from posts.models import Post
+from users.models import User, UserActivity
+
+
+SEED_EMAIL_DOMAIN = 'seed.example.com'
+SEED_PASSWORD = 'password'
+
+# timestamps are spread over a fixed window, so the same seed gives the same data
+START_DATE = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+TIME_WINDOW = timedelta(days=90)
+
+ACTIONS = ['submit_post', 'switch_like']
+
+
+def zipf_cum_weights(count, exponent) -> list[float]:
+    # rank 1 is the most popular one
+    return list(accumulate(1 / rank**exponent for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic, production-scale dataset for load testing: users, '
+        'posts with a Zipf-distributed likes graph and user activity. The data is '
+        'deterministic for a given --seed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--likes', type=int, default=1_000_000)
+        parser.add_argument('--activities', type=int, default=100_000)
+        parser.add_argument(
+            '--deleted-ratio',
+            type=float,
+            default=0.05,
+            help='Share of posts which are soft deleted',
+        )
+        parser.add_argument(
+            '--zipf-exponent',
+            type=float,
+            default=1.1,
+            help='Skew of the likes and authors distribution',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument(
+            '--clear',
+            action=BooleanOptionalAction,
+            default=True,
+            help='Remove previously seeded data first (default). With --no-clear, '
+            'posts, likes and activities are added and the existing users kept',
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+
+        with transaction.atomic():
+            if options['clear']:
+                self.clear()
+
+            user_ids = self.timed('users', self.create_users, options['users'])
+            post_ids = self.timed(
+                'posts',
+                self.create_posts,
+                user_ids,
+                options['posts'],
+                options['deleted_ratio'],
+                options['zipf_exponent'],
+            )
+            self.timed(
+                'likes',
+                self.create_likes,
+                user_ids,
+                post_ids,
+                options['likes'],
+                options['zipf_exponent'],
+            )
+            self.timed(
+                'activities', self.create_activities, user_ids, options['activities']
+            )
+
+    def timed(self, label, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(f'Seeded {label} in {elapsed:.2f}s')
+        return result
+
+    def random_timestamp(self, start=START_DATE):
+        # between `start` and the end of the window
+        return start + self.rng.random() * (START_DATE + TIME_WINDOW - start)
+
+    def clear(self):
+        # posts, likes and tokens cascade
+        User.objects.filter(email__endswith=f'@{SEED_EMAIL_DOMAIN}').delete()
+        UserActivity.objects.filter(username__startswith='seed-').delete()
+
+    def create_users(self, count) -> list[int]:
+        # PBKDF2 is slow on purpose, all seeded users share a single hash
+        password = make_password(SEED_PASSWORD)
+
+        seed_users = User.objects.filter(email__endswith=f'@{SEED_EMAIL_DOMAIN}')
+        existing = set(seed_users.values_list('email', flat=True))
+
+        users = (
+            User(
+                email=f'seed-{index}@{SEED_EMAIL_DOMAIN}',
+                username=f'seed-{index}',
+                password=password,
+                is_sandboxed=False,
+                date_joined=self.random_timestamp(),
+            )
+            for index in range(count)
+        )
+
+        # kept with --no-clear
+        users = (user for user in users if user.email not in existing)
+
+        for batch in batched(users, self.batch_size):
+            User.objects.bulk_create(batch)
+
+        self.usernames = dict(seed_users.values_list('id', 'username'))
+
+        return sorted(self.usernames)
+
+    def create_posts(self, user_ids, count, deleted_ratio, exponent) -> list[int]:
+        # a few users write most of the posts
+        author_weights = zipf_cum_weights(len(user_ids), exponent)
+        authors = self.rng.choices(user_ids, cum_weights=author_weights, k=count)
+
+        # in id order, like the posts submitted through the API
+        timestamps = sorted(self.random_timestamp() for _ in range(count))
+
+        posts = []
+
+        for index, (author_id, created_at) in enumerate(zip(authors, timestamps)):
+            is_deleted = self.rng.random() < deleted_ratio
+            deleted_at = self.random_timestamp(created_at) if is_deleted else None
+
+            posts.append(
+                Post(
+                    author_id=author_id,
+                    content=f'Seeded post #{index}',
+                    is_deleted=is_deleted,
+                    deleted_at=deleted_at,
+                )
+            )
+
+        last_id = Post.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+
+        for batch in batched(posts, self.batch_size):
+            Post.objects.bulk_create(batch)
+
+        post_ids = list(
+            Post.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+
+        # bulk_create() sets the auto_now_add created_at to now, the ids are not
+        # returned by every database either
+        for post, post_id, created_at in zip(posts, post_ids, timestamps):
+            post.id = post_id
+            post.created_at = created_at
+
+        Post.objects.bulk_update(posts, ['created_at'], batch_size=self.batch_size)
+
+        return post_ids
+
+    def create_likes(self, user_ids, post_ids, count, exponent):
+        # the newest posts are the most popular ones
+        post_weights = zipf_cum_weights(len(post_ids), exponent)
+        popular_posts = post_ids[::-1]
+
+        likes = set()
+
+        # (post, user) pairs are unique, so duplicates are drawn again - popular
+        # posts can run out of likers, hence the bounded number of rounds
+        for _ in range(10):
+            missing = count - len(likes)
+            if missing <= 0:
+                break
+
+            posts = self.rng.choices(popular_posts, cum_weights=post_weights, k=missing)
+            users = self.rng.choices(user_ids, k=missing)
+            likes.update(zip(posts, users))
+
+        through_table = Post.likes.through._meta.db_table
+
+        with connection.cursor() as cursor:
+            for batch in batched(sorted(likes), self.batch_size):
+                cursor.executemany(
+                    f'INSERT INTO {through_table} (post_id, user_id) VALUES (%s, %s)',
+                    batch,
+                )
+
+    def create_activities(self, user_ids, count):
+        activities = (
+            UserActivity(
+                username=self.usernames[self.rng.choice(user_ids)],
+                action=self.rng.choice(ACTIONS),
+                timestamp=self.random_timestamp(),
+            )
+            for _ in range(count)
+        )
+
+        for batch in batched(activities, self.batch_size):
+            UserActivity.objects.bulk_create(batch)
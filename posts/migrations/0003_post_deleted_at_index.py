@@ -0,0 +1,20 @@
+# Generated by Django 5.0.6 on 2026-10-19 17:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(
+                fields=['deleted_at'], name='posts_post_deleted_b51458_idx'
+            ),
+        ),
+    ]
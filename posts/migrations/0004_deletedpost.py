@@ -0,0 +1,40 @@
+# Generated by Django 5.0.6 on 2026-10-19 18:27
+
+from django.db import migrations, models
+
+
+def add_tombstones(apps, schema_editor):
+    # the posts soft deleted and not hard deleted yet
+    DeletedPost = apps.get_model('posts', 'DeletedPost')
+    Post = apps.get_model('posts', 'Post')
+
+    deleted = Post.objects.filter(is_deleted=True, deleted_at__isnull=False)
+    DeletedPost.objects.bulk_create(
+        DeletedPost(post_id=post_id, deleted_at=deleted_at)
+        for post_id, deleted_at in deleted.values_list('id', 'deleted_at')
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0003_post_deleted_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedPost',
+            fields=[
+                ('post_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('deleted_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [
+                    models.Index(
+                        fields=['deleted_at', 'post_id'],
+                        name='posts_delet_deleted_127003_idx',
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(add_tombstones, migrations.RunPython.noop),
+    ]
@@ -11,6 +11,25 @@ class Post(models.Model):
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        # deletions since a point in time, for /home/changes/ and the hard delete task
+        indexes = [models.Index(fields=['deleted_at'])]
+
     @property
     def liked_users(self):
         return self.likes.all()
+
+
+class DeletedPost(models.Model):
+    """
+    Tombstone of a deleted post. It outlives the post (hard deleted after
+    DELETED_POSTS_RETENTION) so that /home/changes/ can report the deletion for
+    DELETED_POST_TOMBSTONE_RETENTION.
+    """
+
+    post_id = models.BigIntegerField(primary_key=True)
+    deleted_at = models.DateTimeField()
+
+    class Meta:
+        # the deletions since a cursor, page by page
+        indexes = [models.Index(fields=['deleted_at', 'post_id'])]
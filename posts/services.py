@@ -1,8 +1,54 @@
+from datetime import UTC, datetime, timedelta
+
+from django.conf import settings
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import (
+    Count,
+    Exists,
+    Max,
+    OuterRef,
+    Prefetch,
+    Q,
+    Subquery,
+)
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
-from posts.models import Post
-from exceptions import PostNotFoundException, UnauthorizedAccessException
+from django_project.iterators import batched
+from posts.cache import (
+    get_feed_head,
+    invalidate_post_fragment,
+    invalidate_user_stats,
+    update_feed_head,
+)
+from posts.models import DeletedPost, Post
+from users.models import User
+from exceptions import (
+    CursorExpiredException,
+    PostNotFoundException,
+    UnauthorizedAccessException,
+)
+
+
+# rows of the posts_post_likes table
+Like = Post.likes.through
+
+# columns read for each field of a sparse post (see get_feed_queryset)
+POST_FIELD_COLUMNS = {
+    'id': ['id'],
+    'author': ['author_id'],
+    'content': ['content'],
+    'created_at': ['created_at'],
+}
+
+# deletions committed slightly after a sync started are reported by the next one
+CHANGES_CURSOR_OVERLAP = timedelta(seconds=1)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+# columns of the users read for UserSerializer
+USER_COLUMNS = ['id', 'email', 'profile_picture_thumbnails']
 
 
 def get_post(id) -> Post | None:
@@ -23,6 +69,7 @@ def switch_like_status(post_id, user) -> str:
     if not post:
         raise PostNotFoundException()
 
+    # the cached fragment is invalidated by the like signals (see posts/signals.py)
     if user in post.likes.all():
         post.likes.remove(user)
         return 'Post unliked'
@@ -40,14 +87,169 @@ def remove_post(post_id, user) -> None:
     if not is_user_owner(post, user):
         raise UnauthorizedAccessException()
 
-    post.is_deleted = True
-    post.deleted_at = timezone.now()
-    post.save()
+    if post.is_deleted:
+        return
+
+    deleted_at = timezone.now()
+
+    # only the request which actually deletes the post takes it out of the feed,
+    # a concurrent one would count it twice
+    with transaction.atomic():
+        deleted = Post.objects.filter(id=post.id, is_deleted=False).update(
+            is_deleted=True, deleted_at=deleted_at
+        )
+
+        if deleted:
+            add_tombstones([post.id], deleted_at)
+
+    if deleted:
+        # update() sends no post_save, see posts/signals.py
+        invalidate_post_fragment(post.id)
+        invalidate_user_stats(post.author_id)
+        remove_from_feed(post)
+
+
+def add_tombstones(post_ids, deleted_at) -> None:
+    """Record the deletion of posts for /home/changes/, once per post"""
+
+    DeletedPost.objects.bulk_create(
+        [DeletedPost(post_id=post_id, deleted_at=deleted_at) for post_id in post_ids],
+        ignore_conflicts=True,
+    )
+
+
+def save_post(serializer, author) -> Post:
+    post = serializer.save(author=author)
+
+    add_to_feed(post)
+
+    return post
+
+
+def add_to_feed(post) -> None:
+    """Put a new post on top of the cached feed"""
+
+    def add(posts, count):
+        # already there when the head was loaded after the post was committed
+        if (post.id, post.author_id) in posts:
+            return posts, count
+
+        posts = [(post.id, post.author_id), *posts]
+        return posts[: settings.FEED_CACHED_POSTS], count + 1
+
+    update_feed_head(add)
+
+
+def remove_from_feed(post) -> None:
+    """Take a removed post out of the cached feed"""
+
+    def remove(posts, count):
+        if (post.id, post.author_id) in posts:
+            return [pair for pair in posts if pair[0] != post.id], count - 1
+
+        if posts and post.id < posts[-1][0]:
+            # older than the cached posts, whether it is still counted is unknown
+            return None
+
+        # the head was loaded after the post was removed
+        return posts, count
+
+    update_feed_head(remove)
+
+
+def get_feed_queryset(viewer=None, fields=None, expand=None):
+    """
+    The feed, newest posts first. For a `viewer` the posts are compact: they carry
+    `like_count` and `liked_by_me` instead of the prefetched liked users.
+
+    `fields` and `expand` are the sparse fieldset of the serializer (see
+    DynamicFieldsMixin): relations which are not rendered are not fetched, the
+    ones rendered as ids are fetched as ids, and the other columns are deferred.
+    """
+
+    def wanted(name):
+        return fields is None or name in fields
+
+    def expanded(name):
+        return wanted(name) and (expand is None or name in expand)
+
+    posts = Post.objects.filter(is_deleted=False)
+    columns = ['id']
+
+    if fields is not None:
+        columns += [
+            column for name in fields for column in POST_FIELD_COLUMNS.get(name, [])
+        ]
+
+    if expanded('author'):
+        posts = posts.select_related('author')
+        columns += [f'author__{column}' for column in USER_COLUMNS]
+
+    if viewer is not None:
+        # computed by the feed query itself, whatever the number of likes. Subqueries
+        # rather than a join, so the page count leaves them out.
+        likes = Like.objects.filter(post=OuterRef('pk'))
+        like_count = likes.values('post').annotate(count=Count('*')).values('count')
+        annotations = {
+            'like_count': Coalesce(Subquery(like_count), 0),
+            'liked_by_me': Exists(likes.filter(user=viewer)),
+        }
+        posts = posts.annotate(
+            **{name: value for name, value in annotations.items() if wanted(name)}
+        )
+    elif expanded('liked_users'):
+        posts = posts.prefetch_related('likes')
+    elif wanted('liked_users'):
+        posts = posts.prefetch_related(
+            Prefetch('likes', queryset=User.objects.only('id'))
+        )
+
+    if fields is not None:
+        posts = posts.only(*columns)
+
+    return posts.order_by('-id')
+
+
+def load_feed_head() -> tuple[list[tuple[int, int]], int]:
+    posts = Post.objects.filter(is_deleted=False)
+    newest = posts.order_by('-id').values_list('id', 'author_id')
+
+    return list(newest[: settings.FEED_CACHED_POSTS]), posts.count()
+
+
+def get_feed_page(pages, items_per_page) -> tuple[list[tuple[int, int]], bool]:
+    """
+    The (post id, author id) pairs of a feed page, for the fragment cache. The
+    first pages are served from the cached feed head, without any query.
+    """
 
+    posts, count = get_feed_head(load_feed_head)
 
-def get_all_posts(pages, items_per_page) -> tuple[list[Post], bool]:
+    start = (pages - 1) * items_per_page
+    end = start + items_per_page
+    is_cached = end <= len(posts) or len(posts) == count
+
+    # out of range pages are left to the paginator, like the uncached ones
+    if pages >= 1 and (start < count or pages == 1) and is_cached:
+        return posts[start:end], end < count
+
+    posts = Post.objects.filter(is_deleted=False).order_by('-id')
+    paginator = Paginator(posts.values_list('id', 'author_id'), items_per_page)
+
+    page_obj = paginator.get_page(pages)
+
+    return list(page_obj), page_obj.has_next()
+
+
+def get_posts_by_id(post_ids) -> list[Post]:
+    return list(get_feed_queryset().filter(id__in=post_ids))
+
+
+def get_all_posts(
+    pages, items_per_page, viewer=None, fields=None, expand=None
+) -> tuple[list[Post], bool]:
     # QuerySets are lazy - no db interaction is made until they are evaluated
-    all_posts = Post.objects.filter(is_deleted=False).order_by('-id')
+    all_posts = get_feed_queryset(viewer, fields, expand)
     paginator = Paginator(all_posts, items_per_page)
 
     page_obj = paginator.get_page(pages)
@@ -55,3 +257,138 @@ def get_all_posts(pages, items_per_page) -> tuple[list[Post], bool]:
     posts = list(page_obj)
 
     return posts, has_next
+
+
+def iter_all_posts(chunk_size, viewer=None, fields=None, expand=None):
+    """Yield the whole feed in lists of `chunk_size` posts, without loading it at once"""
+
+    # iterator() fetches chunk_size rows at a time and prefetches the likes per chunk
+    posts = get_feed_queryset(viewer, fields, expand).iterator(chunk_size=chunk_size)
+
+    yield from batched(posts, chunk_size)
+
+
+def get_post_likes(
+    post_id, cursor, limit, fields=None
+) -> tuple[list[User], int | None]:
+    """
+    A page of the users who liked a post, by user id, after the `cursor` user id.
+    Only the user columns in `fields` are read, when given. Returns the users and
+    the cursor of the next page (None on the last one).
+    """
+
+    post = get_post(post_id)
+
+    if not post or post.is_deleted:
+        raise PostNotFoundException()
+
+    # walks the unique (post_id, user_id) index, no OFFSET however deep the page
+    likes = Like.objects.filter(post_id=post.id).select_related('user')
+    if cursor is not None:
+        likes = likes.filter(user_id__gt=cursor)
+
+    if fields is not None:
+        columns = [
+            column for column in USER_COLUMNS if column == 'id' or column in fields
+        ]
+        likes = likes.only('user_id', *[f'user__{column}' for column in columns])
+
+    likes = list(likes.order_by('user_id')[: limit + 1])
+    users = [like.user for like in likes[:limit]]
+    next_cursor = users[-1].id if len(likes) > limit else None
+
+    return users, next_cursor
+
+
+def encode_changes_cursor(post_id, synced_at, deleted_id=0) -> str:
+    # exact microseconds, a deletion page continues after this very timestamp
+    cursor = f'{post_id}:{(synced_at - EPOCH) // timedelta(microseconds=1)}'
+
+    # the last deleted post id of a page cut within a timestamp
+    return f'{cursor}:{deleted_id}' if deleted_id else cursor
+
+
+def decode_changes_cursor(cursor) -> tuple[int, datetime, int]:
+    """
+    The last post id, the sync time and the last deleted post id (0 if none) of a
+    cursor, ValueError if it is invalid
+    """
+
+    parts = cursor.split(':')
+    if len(parts) == 2:
+        parts.append('0')
+
+    try:
+        post_id, synced_at, deleted_id = map(int, parts)
+        synced_at = EPOCH + timedelta(microseconds=synced_at)
+
+    except (ValueError, OverflowError):
+        raise ValueError('Invalid cursor')
+
+    return post_id, synced_at, deleted_id
+
+
+def get_feed_changes(
+    cursor, limit, viewer=None, fields=None, expand=None
+) -> tuple[list[Post], list[int], str, bool]:
+    """
+    The posts submitted after a /home/changes/ cursor (at most `limit`, oldest
+    first) and the ids of the older posts deleted since (at most `limit`, in the
+    order of deletion). Returns them with the next cursor and whether more posts
+    or deletions are waiting. Without a cursor, only the cursor of the current
+    feed is returned.
+
+    Deletions are read from the tombstones, which outlive the posts, and a cursor
+    expires with them (after DELETED_POST_TOMBSTONE_RETENTION).
+
+    New posts are found by id. An id is taken at insert time, not at commit, so a
+    post committed after a post with a higher id (concurrent submissions on MySQL
+    or PostgreSQL) is not returned if a sync falls in between. It is only seen
+    once the feed is loaded again.
+    """
+
+    # taken before the posts are read, so nothing is skipped by the next sync
+    synced_at = timezone.now() - CHANGES_CURSOR_OVERLAP
+
+    if cursor is None:
+        last_id = Post.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        return [], [], encode_changes_cursor(last_id, synced_at), False
+
+    since_id, since, since_deleted_id = decode_changes_cursor(cursor)
+
+    # the deletions before the tombstone retention are no longer known
+    retention = timedelta(seconds=settings.DELETED_POST_TOMBSTONE_RETENTION)
+    if since < timezone.now() - retention:
+        raise CursorExpiredException()
+
+    posts = get_feed_queryset(viewer, fields, expand).filter(id__gt=since_id)
+    posts = list(posts.order_by('id')[: limit + 1])
+    has_more = len(posts) > limit
+    posts = posts[:limit]
+
+    # the newer posts are only returned while they exist. Up to synced_at, so a
+    # deletion committed late is still found by the next sync
+    tombstones = DeletedPost.objects.filter(
+        Q(deleted_at__gt=since) | Q(deleted_at=since, post_id__gt=since_deleted_id),
+        deleted_at__lte=synced_at,
+        post_id__lte=since_id,
+    )
+    tombstones = list(
+        tombstones.order_by('deleted_at', 'post_id').values_list(
+            'post_id', 'deleted_at'
+        )[: limit + 1]
+    )
+    last_id = posts[-1].id if posts else since_id
+
+    if len(tombstones) > limit:
+        # the next page continues after the last deletion returned
+        tombstones = tombstones[:limit]
+        deleted_id, synced_at = tombstones[-1]
+        has_more = True
+    else:
+        deleted_id = 0
+
+    deleted = [post_id for post_id, _ in tombstones]
+    cursor = encode_changes_cursor(last_id, synced_at, deleted_id)
+
+    return posts, deleted, cursor, has_more
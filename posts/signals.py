@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from posts.cache import (
+    invalidate_feed_head,
+    invalidate_post_fragment,
+    invalidate_post_fragments,
+    invalidate_user_fragments,
+    invalidate_user_stats,
+)
+from posts.models import Post
+from posts.services import add_tombstones
+
+
+Like = Post.likes.through
+
+# the user fields embedded in the rendered posts (see UserSerializer)
+RENDERED_USER_FIELDS = {'email', 'profile_picture', 'profile_picture_thumbnails'}
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post(sender, instance, created, update_fields, **kwargs):
+    # e.g. edited in the admin, new posts are put in the feed by save_post()
+    if created:
+        invalidate_user_stats(instance.author_id)
+        return
+
+    invalidate_post_fragment(instance.id)
+
+    # it may have been (un)deleted
+    if update_fields is None or 'is_deleted' in update_fields:
+        invalidate_feed_head()
+        invalidate_user_stats(instance.author_id)
+
+        if instance.is_deleted:
+            add_tombstones([instance.id], instance.deleted_at or timezone.now())
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    invalidate_post_fragment(instance.id)
+    invalidate_user_stats(instance.author_id)
+
+    # hard deleted without a soft delete first, e.g. with its author
+    if not instance.is_deleted:
+        invalidate_feed_head()
+        add_tombstones([instance.id], timezone.now())
+
+
+def get_liked_post_ids(user_id) -> list[int]:
+    return list(Like.objects.filter(user_id=user_id).values_list('post_id', flat=True))
+
+
+def invalidate_author_stats(post_ids) -> None:
+    """The likes totals of the authors of these posts"""
+
+    if not settings.FRAGMENT_CACHE_ENABLED:
+        return
+
+    authors = Post.objects.filter(id__in=post_ids).values_list('author_id', flat=True)
+
+    for author_id in set(authors):
+        invalidate_user_stats(author_id)
+
+
+@receiver(m2m_changed, sender=Like)
+def invalidate_liked_posts(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        # the post ids when changed from the user (reverse)
+        post_ids = pk_set if reverse else [instance.id]
+    elif action == 'pre_clear':
+        post_ids = get_liked_post_ids(instance.id) if reverse else [instance.id]
+    else:
+        return
+
+    for post_id in post_ids:
+        invalidate_post_fragment(post_id)
+
+    if reverse:
+        invalidate_author_stats(post_ids)
+    else:
+        invalidate_user_stats(instance.author_id)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_deleted_user_likes(sender, instance, **kwargs):
+    # the likes cascade without any signal (Django skips them for the through table)
+    post_ids = get_liked_post_ids(instance.id)
+
+    if post_ids:
+        invalidate_post_fragments(post_ids)
+        invalidate_author_stats(post_ids)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_saved_user(sender, instance, created, update_fields, **kwargs):
+    if created:
+        return
+
+    # saved on every login, only the rendered fields matter
+    if update_fields is None or RENDERED_USER_FIELDS & set(update_fields):
+        invalidate_user_fragments(instance.id)
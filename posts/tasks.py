@@ -1,14 +1,16 @@
 from celery import shared_task
+from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
-from posts.models import Post
+from posts.cache import set_new_post_versions
+from posts.models import DeletedPost, Post
 
 
 @shared_task
 def delete_old_posts():
     print(f'Running task at {timezone.now()}')
 
-    threshold = timezone.now() - timedelta(seconds=30)
+    threshold = timezone.now() - timedelta(seconds=settings.DELETED_POSTS_RETENTION)
     deleted_posts = Post.objects.filter(is_deleted=True, deleted_at__lte=threshold)
 
     print(f'Found {deleted_posts.count()} posts to delete')
@@ -16,3 +18,17 @@ def delete_old_posts():
     deleted_posts.delete()
 
     print('Old posts deleted')
+
+    # the deletions are reported by /home/changes/ until then
+    threshold = timezone.now() - timedelta(
+        seconds=settings.DELETED_POST_TOMBSTONE_RETENTION
+    )
+    DeletedPost.objects.filter(deleted_at__lte=threshold).delete()
+
+
+@shared_task
+def invalidate_liked_post_fragments(user_id):
+    """New versions for the posts a user liked, they embed the user"""
+
+    likes = Post.likes.through.objects.filter(user_id=user_id)
+    set_new_post_versions(likes.values_list('post_id', flat=True).iterator())
@@ -1,12 +1,19 @@
 from django.urls import path
 
-from posts.api import get_posts, submit_post, switch_like, delete_post
+from posts.api import (
+    get_posts,
+    get_posts_changes,
+    submit_post,
+    post_likes,
+    delete_post,
+)
 
 app_name = 'posts'
 
 urlpatterns = [
     path('home/', get_posts, name='get_all_posts'),
+    path('home/changes/', get_posts_changes, name='get_posts_changes'),
     path('posts/', submit_post, name='submit_post'),
-    path('posts/<int:post_id>/likes/', switch_like, name='switch_post_like'),
+    path('posts/<int:post_id>/likes/', post_likes, name='post_likes'),
     path('users/posts/<int:post_id>/', delete_post, name='delete_post'),
 ]
@@ -1,19 +1,52 @@
+import os
+
+from django.conf import settings
+from django.db.models import Q
 from django.forms import ValidationError
-from django.http import HttpResponse
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view, permission_classes, parser_classes
 from rest_framework.response import Response
-from django_project.serializers import UserProfileSerializer, UserSerializer
+from django_project.http import is_not_modified, make_etag, set_private_etag
+from django_project.media import (
+    REVALIDATE_CACHE_CONTROL,
+    build_streamed_response,
+    get_media_etag,
+)
+from django_project.serializers import (
+    DataExportSerializer,
+    ProfilePictureSerializer,
+    UserProfileSerializer,
+    UserSerializer,
+    get_field_selection,
+)
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework.parsers import MultiPartParser, FormParser
 
+from posts.cache import get_user_stats_version
+from users.exports import (
+    get_export_sections,
+    iter_compressed_export,
+    iter_export_records,
+    parse_cursor,
+)
+from users.models import DataExport
 from users.services import (
     create_user,
     get_total_likes_and_posts,
+    request_data_export,
     upload_profile_picture,
 )
+from users.uploadhandlers import ProfilePictureUploadHandler
+from monitoring.services import timed
 
 
 @swagger_auto_schema(method='get', auto_schema=None)
@@ -57,12 +90,18 @@ def register(request):
         email = serializer.validated_data['email']
         password = serializer.validated_data['password']
 
-        if create_user(serializer, email, password):
+        if create_user(email, password):
             return Response(
                 'Registration successful! Login to continue',
                 status=status.HTTP_201_CREATED,
             )
 
+        # registered since the serializer checked the email
+        return Response(
+            {'email': ['user with this email already exists.']},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -110,7 +149,14 @@ def logout(request):
         )
 
 
-@swagger_auto_schema(method='put', tags=['users'], request_body=UserProfileSerializer)
+@swagger_auto_schema(
+    method='put',
+    tags=['users'],
+    request_body=UserProfileSerializer,
+    manual_parameters=[
+        openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+    ],
+)
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
 def update_profile(request):
@@ -129,9 +175,12 @@ def update_profile(request):
     **Request Body:**
     Provide fields you want to update. All fields are optional.
 
+    **Query Parameters:**
+    - fields (`str`): Comma separated fields of the profile to return (default: all).
+
     **Responses:**
     - 201 Created: Profile information successfully updated. Returns the updated user profile object.
-    - 400 Bad Request: If the request data is invalid or profile update fails.
+    - 400 Bad Request: If the request data or fields are invalid or profile update fails.
 
     **Example response on success:**
 
@@ -145,13 +194,24 @@ def update_profile(request):
 
     user_profile = request.user
 
+    try:
+        fields, _ = get_field_selection(request, UserProfileSerializer)
+
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
     serializer = UserProfileSerializer(
         instance=user_profile, data=request.data, partial=True
     )
 
     if serializer.is_valid():
         serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        # the fields select the response only, every field can be updated
+        with timed('serializer'):
+            data = UserProfileSerializer(user_profile, fields=fields).data
+
+        return Response(data, status=status.HTTP_201_CREATED)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -163,6 +223,7 @@ def update_profile(request):
         openapi.Parameter(
             'profile_picture', openapi.IN_FORM, type=openapi.TYPE_FILE, required=True
         ),
+        openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING),
     ],
 )
 @api_view(['PUT'])
@@ -174,7 +235,9 @@ def update_profile_picture(request):
     Update the profile picture of the currently authenticated user
 
     This endpoint allows the authenticated user to update their profile picture.
-    The request must include a valid image file as profile_picture. Upon
+    The request must include a valid JPEG or PNG image file as profile_picture. The
+    upload is validated while it is received: files above the maximum size, with
+    unexpected magic bytes or with too many pixels are rejected early. Upon
     successful update, the updated user object is returned with the updated profile
     picture URL.
 
@@ -185,9 +248,12 @@ def update_profile_picture(request):
     **Request Body:**
     - profile_picture (`binary`): The new profile picture image file.
 
+    **Query Parameters:**
+    - fields (`str`): Comma separated fields of the user to return (default: all).
+
     **Responses:**
     - 201 Created: Profile picture successfully updated. Returns the updated user object.
-    - 400 Bad Request: If the request data is invalid or profile picture update fails.
+    - 400 Bad Request: If the image or fields are invalid, too large or the update fails.
 
     **Example response:**
 
@@ -204,13 +270,32 @@ def update_profile_picture(request):
     }
     """
 
-    user = request.user
-    serializer = UserSerializer(user, data=request.data, partial=True)
+    try:
+        fields, _ = get_field_selection(request, UserSerializer)
+
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # validate the upload while it is streamed, before the body is parsed
+    upload_handler = ProfilePictureUploadHandler()
+    request.upload_handlers.insert(0, upload_handler)
+
+    serializer = ProfilePictureSerializer(data=request.data)
+
+    if upload_handler.error:
+        return Response(
+            {'error': upload_handler.error}, status=status.HTTP_400_BAD_REQUEST
+        )
 
     if serializer.is_valid():
+        user = request.user
+
         try:
-            upload_profile_picture(request.data.get('profile_picture'), user)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            upload_profile_picture(serializer.validated_data['profile_picture'], user)
+            return Response(
+                UserSerializer(user, fields=fields).data,
+                status=status.HTTP_201_CREATED,
+            )
         except ValidationError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -233,8 +318,14 @@ def get_user_likes_and_posts(request):
     **Parameters**:
     - request (`HttpRequest`): The HTTP request containing the user's authentication token.
 
+    With the fragment cache (DJANGO_FRAGMENT_CACHE_URL), the response carries an
+    `ETag`. Sent back in `If-None-Match`, the totals are only returned again once
+    they changed. It is a version counter of the totals, bumped by the post and
+    like signals, so a 304 costs no query.
+
     **Responses**:
     - 200 OK: Returns total likes and posts created by the user.
+    - 304 Not Modified: If the totals did not change since the `If-None-Match` ETag.
     - 401 Unauthorized: If the request is not authenticated or the token is invalid.
 
     **Example response on success:**
@@ -245,6 +336,165 @@ def get_user_likes_and_posts(request):
     }
     """
 
-    likes, posts = get_total_likes_and_posts(request.user)
+    user = request.user
+
+    # the version counter lives in the shared fragment cache
+    if not settings.FRAGMENT_CACHE_ENABLED:
+        likes, posts = get_total_likes_and_posts(user)
+
+        return Response({'Total likes': likes, 'Total posts created': posts})
+
+    etag = make_etag('stats', user.id, get_user_stats_version(user.id))
+
+    if is_not_modified(request, etag):
+        return set_private_etag(HttpResponseNotModified(), etag)
+
+    likes, posts = get_total_likes_and_posts(user)
+
+    response = Response({'Total likes': likes, 'Total posts created': posts})
+
+    return set_private_etag(response, etag)
+
+
+@swagger_auto_schema(
+    method='get',
+    tags=['users'],
+    manual_parameters=[
+        openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING)
+    ],
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_user_data(request):
+    """
+    get:
+    Download all data of the currently authenticated user
+
+    Streams the user's posts, the likes they gave and received and their activity
+    as gzip-compressed newline-delimited JSON, one record per line. Every record
+    has a `type` (posts, likes_given, likes_received or activity) and a `cursor`.
+    An interrupted download is resumed by passing the cursor of the last record
+    received.
+
+    **Query Parameters:**
+    - cursor (`str`): Resume the export after this record (e.g. `posts:123`).
+
+    **Responses:**
+    - 200 OK: The `export.ndjson.gz` file.
+    - 400 Bad Request: If the cursor is invalid.
+
+    **Example record:**
+
+    {"type": "likes_given", "cursor": "likes_given:42", "id": 42, "post_id": 7, "user_id": 1}
+    """
+
+    cursor = request.GET.get('cursor')
+
+    if cursor:
+        try:
+            parse_cursor(cursor, get_export_sections(request.user))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    records = iter_export_records(request.user, cursor)
+    response = StreamingHttpResponse(
+        iter_compressed_export(records), content_type='application/gzip'
+    )
+    response['Content-Disposition'] = 'attachment; filename="export.ndjson.gz"'
+
+    return response
+
+
+@swagger_auto_schema(method='post', tags=['users'])
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_data_export(request):
+    """
+    post:
+    Export all data of the currently authenticated user in the background
+
+    For large accounts. The export is written by a background task and the user is
+    emailed a link once it is done. Its status can be checked at
+    `/users/exports/<id>/`, the file is downloaded from `/users/exports/<id>/file/`
+    until it expires after EXPORT_RETENTION seconds.
+
+    **Responses:**
+    - 202 Accepted: The export was queued.
+
+    **Example response on success:**
+
+    {
+        'id': 1,
+        'status': 'pending',
+        'records': 0,
+        'created_at': '2024-07-02T20:53:34.148889Z',
+        'finished_at': null,
+        'url': null
+    }
+    """
+
+    export = request_data_export(request.user)
+
+    return Response(DataExportSerializer(export).data, status=status.HTTP_202_ACCEPTED)
+
+
+@swagger_auto_schema(method='get', tags=['users'])
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_data_export(request, export_id):
+    """
+    get:
+    Retrieve the status of a data export of the currently authenticated user
+
+    **Responses:**
+    - 200 OK: The export, with the URL of the file once its status is `done`.
+    - 404 Not Found: If the user has no export with this id.
+    """
+
+    export = get_object_or_404(DataExport, id=export_id, user=request.user)
+
+    return Response(DataExportSerializer(export).data)
+
+
+@swagger_auto_schema(method='get', tags=['users'])
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def download_data_export(request, export_id):
+    """
+    get:
+    Download the file of a finished data export
+
+    Only the user of the export can download it (staff users for the exports of
+    everything). The file is streamed with support for `Range` requests.
+
+    **Responses:**
+    - 200 OK: The `export.ndjson.gz` file.
+    - 404 Not Found: If the user has no finished export with this id.
+    """
+
+    owner = Q(user=request.user)
+    if request.user.is_staff:
+        owner |= Q(user=None)
+
+    export = get_object_or_404(
+        DataExport.objects.filter(owner).exclude(file=''),
+        id=export_id,
+        status=DataExport.Status.DONE,
+    )
+
+    try:
+        path = export.file.path
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404()
+
+    etag = get_media_etag(export.file.name, stat)
+    response = build_streamed_response(request, path, stat, etag)
+
+    response['Content-Type'] = 'application/gzip'
+    response['Content-Disposition'] = 'attachment; filename="export.ndjson.gz"'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Cache-Control'] = REVALIDATE_CACHE_CONTROL
 
-    return Response({'Total likes': likes, 'Total posts created': posts})
+    return response
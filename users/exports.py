@@ -0,0 +1,98 @@
+from django.conf import settings
+
+from django_project.middleware import COMPRESSOR_FACTORIES, compress_stream
+from django_project.renderers import FastJSONRenderer
+from posts.models import Post
+from users.models import UserActivity
+
+
+Like = Post.likes.through
+
+POST_FIELDS = ['id', 'author_id', 'content', 'created_at', 'is_deleted', 'deleted_at']
+LIKE_FIELDS = ['id', 'post_id', 'user_id']
+ACTIVITY_FIELDS = ['id', 'username', 'action', 'timestamp']
+
+
+def get_export_sections(user=None) -> list[tuple]:
+    """The exported querysets (as values), in order - of `user` or of everything"""
+
+    if user is None:
+        return [
+            ('posts', Post.objects.values(*POST_FIELDS)),
+            ('likes', Like.objects.values(*LIKE_FIELDS)),
+            ('activity', UserActivity.objects.values(*ACTIVITY_FIELDS)),
+        ]
+
+    return [
+        ('posts', Post.objects.filter(author_id=user.id).values(*POST_FIELDS)),
+        ('likes_given', Like.objects.filter(user_id=user.id).values(*LIKE_FIELDS)),
+        (
+            'likes_received',
+            Like.objects.filter(post__author_id=user.id).values(*LIKE_FIELDS),
+        ),
+        (
+            'activity',
+            UserActivity.objects.filter(username=user.username).values(
+                *ACTIVITY_FIELDS
+            ),
+        ),
+    ]
+
+
+def parse_cursor(cursor, sections) -> tuple[int, int]:
+    """`<section>:<last id>` into the index of the section and the last exported id"""
+
+    section, _, last_id = cursor.partition(':')
+    names = [name for name, _ in sections]
+
+    if section not in names or not last_id.isdigit():
+        raise ValueError('Invalid export cursor.')
+
+    return names.index(section), int(last_id)
+
+
+def iter_keyset(queryset, chunk_size, after=0):
+    # id > last id instead of OFFSET, every chunk is an index range scan
+    while True:
+        rows = list(queryset.filter(id__gt=after).order_by('id')[:chunk_size])
+
+        if not rows:
+            return
+
+        yield from rows
+        after = rows[-1]['id']
+
+
+def iter_export_records(user=None, cursor=None, chunk_size=None):
+    """
+    Yield every exported row as a dict with its `type` (section) and `cursor`.
+    Passing the cursor of the last received record resumes the export after it.
+    """
+
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    sections = get_export_sections(user)
+    start_section, after = parse_cursor(cursor, sections) if cursor else (0, 0)
+
+    for index, (name, queryset) in enumerate(sections):
+        if index < start_section:
+            continue
+
+        start_after = after if index == start_section else 0
+
+        for row in iter_keyset(queryset, chunk_size, start_after):
+            yield {'type': name, 'cursor': f'{name}:{row["id"]}', **row}
+
+
+def iter_export_lines(records):
+    renderer = FastJSONRenderer()
+
+    for record in records:
+        yield renderer.render(record) + b'\n'
+
+
+def iter_compressed_export(records):
+    """The records as gzip-compressed NDJSON chunks, built record by record"""
+
+    compressor = COMPRESSOR_FACTORIES['gzip'](settings.EXPORT_COMPRESSION_LEVEL)
+
+    return compress_stream(iter_export_lines(records), compressor)
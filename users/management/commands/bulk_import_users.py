@@ -0,0 +1,174 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from django_project.iterators import batched
+from users.models import User
+from users.services import USERNAME_ATTEMPTS, build_username
+
+
+def hash_passwords(passwords) -> list[str]:
+    # runs in the worker processes, PBKDF2 is CPU bound
+    return [make_password(password) for password in passwords]
+
+
+def read_rows(path, file_format):
+    with open(path, newline='', encoding='utf-8') as file:
+        if file_format == 'csv':
+            yield from csv.DictReader(file)
+            return
+
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = (
+        'Import users from a CSV or NDJSON file with email, password and optional '
+        'first_name and last_name columns. Passwords are hashed across a process '
+        'pool and users are inserted in batches. Existing emails are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file to import')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'ndjson'],
+            help='File format, guessed from the extension by default',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument(
+            '--prehashed',
+            action='store_true',
+            help='Passwords are already hashed in a format Django understands',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'ndjson'
+        )
+
+        if not os.path.isfile(path):
+            raise CommandError(f'File {path} does not exist.')
+
+        batches = batched(self.iter_users(path, file_format), options['batch_size'])
+
+        if options['prehashed']:
+            imported = self.import_prehashed(batches)
+        else:
+            imported = self.import_hashing(batches, options['workers'])
+
+        self.stdout.write(self.style.SUCCESS(f'{imported} users imported.'))
+
+    def iter_users(self, path, file_format):
+        for line_number, row in enumerate(read_rows(path, file_format), start=1):
+            email = User.objects.normalize_email((row.get('email') or '').strip())
+            password = row.get('password')
+
+            if not email or not password:
+                self.stderr.write(
+                    f'Skipping row {line_number}: email and password required.'
+                )
+                continue
+
+            yield User(
+                email=email,
+                first_name=row.get('first_name') or '',
+                last_name=row.get('last_name') or '',
+                password=password,
+                is_sandboxed=True,
+            )
+
+    def import_prehashed(self, batches) -> int:
+        imported = 0
+
+        for users in batches:
+            for user in users:
+                try:
+                    identify_hasher(user.password)
+                except ValueError:
+                    raise CommandError(f'Password of {user.email} is not hashed.')
+
+            imported += self.insert(users)
+
+        return imported
+
+    def import_hashing(self, batches, workers) -> int:
+        imported = 0
+        pending = []
+
+        # workers started with spawn (Windows, macOS) need their own app registry
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            for users in batches:
+                # split every batch across the workers
+                chunk_size = -(-len(users) // workers)
+                futures = [
+                    pool.submit(hash_passwords, [user.password for user in chunk])
+                    for chunk in batched(users, chunk_size)
+                ]
+                pending.append((users, futures))
+
+                # keep a bounded number of batches in flight, so memory stays flat
+                # while the pool hashes ahead of the inserts
+                if len(pending) >= workers * 2:
+                    imported += self.insert_hashed(*pending.pop(0))
+
+            for users, futures in pending:
+                imported += self.insert_hashed(users, futures)
+
+        return imported
+
+    def insert_hashed(self, users, futures) -> int:
+        passwords = [password for future in futures for password in future.result()]
+
+        for user, password in zip(users, passwords):
+            user.password = password
+
+        return self.insert(users)
+
+    def insert(self, users) -> int:
+        """Insert the users whose email is not taken, returns how many were"""
+
+        processed = len(users)
+        inserted = 0
+
+        for attempt in range(USERNAME_ATTEMPTS):
+            emails = [user.email for user in users]
+            existing = set(
+                User.objects.filter(email__in=emails).values_list('email', flat=True)
+            )
+            users = [user for user in users if user.email not in existing]
+
+            if not users:
+                break
+
+            for user in users:
+                user.username = build_username(user.email, attempt)
+
+            # bulk_create() does not tell which rows were ignored, the users found
+            # with their email and username afterwards are the inserted ones
+            User.objects.bulk_create(users, ignore_conflicts=True)
+            created = set(
+                User.objects.filter(
+                    email__in=[user.email for user in users],
+                    username__in=[user.username for user in users],
+                ).values_list('email', 'username')
+            )
+            inserted += len(created)
+
+            # the others collided on the username, or their email was just taken
+            users = [
+                user for user in users if (user.email, user.username) not in created
+            ]
+
+        self.stdout.write(f'Inserted {inserted} of {processed} users.')
+
+        return inserted
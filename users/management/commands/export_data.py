@@ -0,0 +1,70 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.exports import (
+    get_export_sections,
+    iter_compressed_export,
+    iter_export_records,
+    parse_cursor,
+)
+from users.models import User
+from users.services import request_data_export
+
+
+class Command(BaseCommand):
+    help = (
+        'Export the posts, likes and activity of a user (or of everything) as '
+        'gzip-compressed NDJSON. Rows are read in keyset-ordered chunks, so memory '
+        'stays constant, and an interrupted export is resumed with --cursor.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Email of the exported user, all by default')
+        parser.add_argument(
+            '--output',
+            default='export.ndjson.gz',
+            help='File to write, - for stdout',
+        )
+        parser.add_argument('--cursor', help='Resume after this record cursor')
+        parser.add_argument(
+            '--background',
+            action='store_true',
+            help='Run as a Celery task writing to the export storage',
+        )
+        parser.add_argument(
+            '--notify', default='', help='Email to notify when --background is done'
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(f'No user with the email {options["user"]}.')
+
+        if options['background']:
+            export = request_data_export(user, options['notify'])
+            self.stderr.write(f'Queued export {export.id}.')
+            return
+
+        cursor = options['cursor']
+        if cursor:
+            try:
+                parse_cursor(cursor, get_export_sections(user))
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        chunks = iter_compressed_export(iter_export_records(user, cursor))
+
+        if options['output'] == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            return
+
+        # appending to a resumed export keeps a valid multi-member gzip file
+        with open(options['output'], 'ab' if cursor else 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+
+        self.stderr.write(f'Exported to {options["output"]}.')
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-19 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('users', '0003_remove_useractivity_user_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_picture_thumbnails',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
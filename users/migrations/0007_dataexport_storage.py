@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-19 18:22
+
+import users.models
+from django.db import migrations, models
+
+
+def delete_media_exports(apps, schema_editor):
+    # written to the media storage before, release their files there
+    from django.core.files.storage import default_storage
+
+    DataExport = apps.get_model('users', 'DataExport')
+
+    for export in DataExport.objects.exclude(file=''):
+        default_storage.delete(export.file.name)
+
+    DataExport.objects.exclude(file='').delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('users', '0006_dataexport'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_media_exports, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='dataexport',
+            name='file',
+            field=models.FileField(
+                blank=True, storage=users.models.get_export_storage, upload_to=''
+            ),
+        ),
+    ]
@@ -1,11 +1,19 @@
+from django.core.files.storage import storages
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
 
+def get_export_storage():
+    # see STORAGES in the settings, resolved when a file is accessed
+    return storages['exports']
+
+
 class User(AbstractUser):
     username = models.CharField(max_length=50, blank=True, null=True, unique=True)
     email = models.EmailField(unique=True)
     profile_picture = models.ImageField(blank=True)
+    # {'<size>': {'<extension>': '<file name>'}}, filled in by a background task after upload
+    profile_picture_thumbnails = models.JSONField(default=dict, blank=True)
     description = models.CharField(max_length=200, blank=True)
     is_sandboxed = models.BooleanField(null=True)
     is_deleted = models.BooleanField(default=False)
@@ -15,8 +23,57 @@ class User(AbstractUser):
     # when creating a user via the createsuperuser management command
     REQUIRED_FIELDS = ['username']
 
+    @property
+    def profile_picture_thumbnail_names(self):
+        return [
+            name
+            for variants in self.profile_picture_thumbnails.values()
+            for name in variants.values()
+        ]
+
 
 class UserActivity(models.Model):
     username = models.CharField(max_length=50, blank=True, null=True)
     action = models.TextField(max_length=500)
     timestamp = models.DateTimeField()
+
+
+class MediaBlob(models.Model):
+    """A content-addressed file kept by `ContentAddressedStorage`"""
+
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['ref_count', 'updated_at'])]
+
+
+class DataExport(models.Model):
+    """A compressed NDJSON export of a user's data (of everything without a user)"""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending'
+        RUNNING = 'running'
+        DONE = 'done'
+        FAILED = 'failed'
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='data_exports',
+    )
+    # who is notified once the export is done
+    notify_email = models.EmailField(blank=True)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING
+    )
+    file = models.FileField(blank=True, storage=get_export_storage)
+    records = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
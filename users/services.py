@@ -1,27 +1,59 @@
-import os
+import hashlib
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.mail import send_mail
 from django.forms import ValidationError
 from django.db import IntegrityError, transaction
 from django.db.models import Sum
 from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.urls import reverse
 
 from posts.models import Post
+from users.models import DataExport, User
 
 
 ALLOWED_IMAGE_TYPES = ['image/jpeg', 'image/png']
 
 
-def create_user(serializer, email, password) -> bool:
-    try:
-        with transaction.atomic():
-            user = serializer.save()
-            user.set_password(password)
-            user.username = email.split('@')[0] + str(user.id)
-            user.is_sandboxed = True
-            user.save()
-        return True
+# usernames tried per user before giving up
+USERNAME_ATTEMPTS = 3
+
+
+def build_username(email, attempt=0) -> str:
+    # derived from the email alone (which is unique), so no id is needed and the
+    # user can be created with a single insert. The 128-bit hash fills the rest of
+    # the 50 characters, another `attempt` gives another one on a collision.
+    local_part = email.split('@')[0]
+    key = email.lower() if attempt == 0 else f'{email.lower()}:{attempt}'
+    suffix = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    return local_part[:18] + suffix
+
+
+def create_user(email, password) -> bool:
+    """Create a sandboxed user, False if the email is taken"""
 
-    except IntegrityError:
-        return False
+    password = make_password(password)
+
+    for attempt in range(USERNAME_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                User.objects.create(
+                    email=email,
+                    username=build_username(email, attempt),
+                    password=password,
+                    is_sandboxed=True,
+                )
+            return True
+
+        except IntegrityError:
+            # registered concurrently, otherwise the username was taken
+            if User.objects.filter(email=email).exists():
+                return False
+
+            if attempt == USERNAME_ATTEMPTS - 1:
+                raise
 
 
 def upload_profile_picture(profile_picture, user) -> None:
@@ -29,18 +61,33 @@ def upload_profile_picture(profile_picture, user) -> None:
         if profile_picture.content_type not in ALLOWED_IMAGE_TYPES:
             raise ValidationError('Only JPEG and PNG images are allowed.')
 
-        try:
-            file_path = os.path.join('uploads', profile_picture.name)
-            with open(os.path.join('media', file_path), 'wb+') as destination:
-                for chunk in profile_picture.chunks():
-                    destination.write(chunk)
+        previous_files = [
+            user.profile_picture.name,
+            *user.profile_picture_thumbnail_names,
+        ]
 
-            user.profile_picture = file_path
+        try:
+            # the storage names the file after its content, only the extension is kept
+            user.profile_picture.save(profile_picture.name, profile_picture, save=False)
+            # the old thumbnails no longer match, clients use the original until
+            # the new ones are generated
+            user.profile_picture_thumbnails = {}
             user.save()
 
         except (IOError, SuspiciousFileOperation) as e:
             raise ValidationError(f'Failed to upload file: {e}')
 
+        # release the replaced files, the storage removes them once unreferenced
+        for name in filter(None, previous_files):
+            default_storage.delete(name)
+
+        # imported here, Celery and Pillow are not needed until the first upload
+        from users.tasks import generate_profile_picture_thumbnails
+
+        transaction.on_commit(
+            lambda: generate_profile_picture_thumbnails.delay(user.id)
+        )
+
 
 def get_total_likes_and_posts(user) -> tuple[int]:
     user_id = user.id
@@ -48,3 +95,34 @@ def get_total_likes_and_posts(user) -> tuple[int]:
     all_user_posts_likes = all_user_posts.aggregate(total_likes=Sum('likes'))
 
     return all_user_posts_likes, all_user_posts.count()
+
+
+def request_data_export(user=None, notify_email='') -> DataExport:
+    """Export the data of `user` (or everything) in the background"""
+
+    from users.tasks import export_data
+
+    export = DataExport.objects.create(
+        user=user, notify_email=notify_email or (user.email if user else '')
+    )
+    transaction.on_commit(lambda: export_data.delay(export.id))
+
+    return export
+
+
+def notify_data_export(export) -> None:
+    if not export.notify_email:
+        return
+
+    if export.status == DataExport.Status.DONE:
+        url = reverse('users:download_data_export', args=[export.id])
+        message = f'Your data export is ready: {settings.BASE_BACKEND_URL}{url}'
+    else:
+        message = 'Your data export failed, please request a new one.'
+
+    send_mail(
+        'Your data export',
+        message,
+        settings.DEFAULT_FROM_EMAIL,
+        [export.notify_email],
+    )
@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from users.models import DataExport
+
+
+@receiver(post_delete, sender=DataExport)
+def delete_export_file(sender, instance, **kwargs):
+    # also sent for the exports of a deleted user (cascade)
+    if instance.file:
+        storage, name = instance.file.storage, instance.file.name
+        transaction.on_commit(lambda: storage.delete(name))
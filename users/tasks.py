@@ -0,0 +1,169 @@
+import logging
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+
+from celery import shared_task
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from users.exports import iter_compressed_export, iter_export_records
+from users.models import DataExport, MediaBlob, User
+from users.services import notify_data_export
+
+
+logger = logging.getLogger(__name__)
+
+
+THUMBNAIL_EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+
+def render_thumbnail(image, size, image_format) -> bytes:
+    thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+    buffer = BytesIO()
+
+    # no exif/icc_profile is passed to save(), so the metadata of the original is dropped
+    thumbnail.save(
+        buffer,
+        format=image_format,
+        quality=settings.PROFILE_PICTURE_THUMBNAIL_QUALITY,
+        optimize=True,
+    )
+
+    return buffer.getvalue()
+
+
+@shared_task
+def generate_profile_picture_thumbnails(user_id):
+    user = User.objects.filter(id=user_id).first()
+
+    if not user or not user.profile_picture:
+        return
+
+    source_name = user.profile_picture.name
+    thumbnails = {}
+
+    with user.profile_picture.open('rb') as source, Image.open(source) as image:
+        # rotate according to the EXIF orientation before the EXIF data is stripped
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+        for size in settings.PROFILE_PICTURE_THUMBNAIL_SIZES:
+            variants = {}
+
+            for image_format in settings.PROFILE_PICTURE_THUMBNAIL_FORMATS:
+                extension = THUMBNAIL_EXTENSIONS[image_format]
+                content = render_thumbnail(image, size, image_format)
+
+                variants[extension] = default_storage.save(
+                    f'thumbnail.{extension}', ContentFile(content)
+                )
+
+            thumbnails[str(size)] = variants
+
+    with transaction.atomic():
+        user = User.objects.select_for_update().filter(id=user_id).first()
+
+        # the user uploaded a new picture while this one was processed
+        if not user or user.profile_picture.name != source_name:
+            stale_files = [
+                name for variants in thumbnails.values() for name in variants.values()
+            ]
+        else:
+            stale_files = user.profile_picture_thumbnail_names
+            user.profile_picture_thumbnails = thumbnails
+            user.save(update_fields=['profile_picture_thumbnails'])
+
+    for name in stale_files:
+        default_storage.delete(name)
+
+
+@shared_task
+def collect_orphaned_media():
+    threshold = timezone.now() - timedelta(seconds=settings.MEDIA_ORPHAN_GRACE_PERIOD)
+    orphaned_blobs = MediaBlob.objects.filter(ref_count=0, updated_at__lte=threshold)
+
+    removed = 0
+
+    for blob in orphaned_blobs.iterator():
+        # the row stays locked until the file is gone, a concurrent save of the
+        # same content waits and then writes the file again under a new row
+        with transaction.atomic():
+            # the blob may have been referenced again since it was selected
+            orphan = (
+                MediaBlob.objects.select_for_update()
+                .filter(id=blob.id, ref_count=0)
+                .first()
+            )
+
+            if orphan:
+                orphan.delete()
+                default_storage.purge(orphan.name)
+                removed += 1
+
+    print(f'Removed {removed} orphaned media files')
+
+
+def count_records(records, export):
+    for record in records:
+        export.records += 1
+        yield record
+
+
+@shared_task
+def export_data(export_id):
+    export = DataExport.objects.select_related('user').get(id=export_id)
+    export.status = DataExport.Status.RUNNING
+    export.save(update_fields=['status'])
+
+    try:
+        # spooled to disk chunk by chunk, the storage then streams it in
+        with tempfile.TemporaryFile() as output:
+            records = count_records(iter_export_records(export.user), export)
+
+            for chunk in iter_compressed_export(records):
+                output.write(chunk)
+
+            output.seek(0)
+            export.file.save(f'export-{export.id}.ndjson.gz', File(output), save=False)
+
+    except Exception as error:
+        logger.exception(f'Data export {export_id} failed')
+        export.status = DataExport.Status.FAILED
+        export.error = str(error)
+    else:
+        export.status = DataExport.Status.DONE
+
+    export.finished_at = timezone.now()
+    export.save()
+
+    notify_data_export(export)
+
+
+@shared_task
+def expire_data_exports():
+    now = timezone.now()
+
+    # their worker died, e.g. killed before it could record the failure
+    timeout = now - timedelta(seconds=settings.EXPORT_TIMEOUT)
+    stale_exports = DataExport.objects.filter(
+        status__in=[DataExport.Status.PENDING, DataExport.Status.RUNNING],
+        created_at__lte=timeout,
+    )
+
+    for export in stale_exports:
+        export.status = DataExport.Status.FAILED
+        export.error = 'Timed out'
+        export.finished_at = now
+        export.save()
+
+        notify_data_export(export)
+
+    # the files are deleted with the rows, see users/signals.py
+    threshold = now - timedelta(seconds=settings.EXPORT_RETENTION)
+    deleted, _ = DataExport.objects.filter(finished_at__lte=threshold).delete()
+
+    print(f'Expired {deleted} data exports')
@@ -0,0 +1,132 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+
+class ProfilePictureUploadHandler(FileUploadHandler):
+    """
+    Validates a profile picture while it is streamed in, before it is buffered.
+
+    The handler sits in front of the default handlers and passes every chunk on to
+    them. It rejects the upload as soon as it exceeds the maximum size, the magic
+    bytes don't belong to an allowed format, or the image header (read lazily through
+    Pillow, without decoding any pixels) declares too many pixels. A rejected upload
+    stops reading the request body, the reason is available as `error`.
+    """
+
+    MAGIC_NUMBERS = {
+        b'\xff\xd8\xff': 'JPEG',
+        b'\x89PNG\r\n\x1a\n': 'PNG',
+    }
+    MAGIC_NUMBER_LENGTH = max(len(magic_number) for magic_number in MAGIC_NUMBERS)
+
+    # JPEG headers may be preceded by large EXIF blocks
+    MAX_HEADER_SIZE = 256 * 1024
+
+    # room for the multipart boundaries and part headers
+    MULTIPART_OVERHEAD = 16 * 1024
+
+    FIELD_NAME = 'profile_picture'
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.error = None
+        self.active = False
+        self.received = 0
+        self.header = b''
+        self.header_checked = False
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        max_request_size = (
+            settings.PROFILE_PICTURE_MAX_UPLOAD_SIZE + self.MULTIPART_OVERHEAD
+        )
+
+        if content_length > max_request_size:
+            self.error = self._too_large_error()
+            # skip parsing entirely, the body is never read
+            return QueryDict(encoding=encoding), MultiValueDict()
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+
+        self.active = field_name == self.FIELD_NAME
+        self.received = 0
+        self.header = b''
+        self.header_checked = False
+
+        if self.active and (self.content_length or 0) > (
+            settings.PROFILE_PICTURE_MAX_UPLOAD_SIZE
+        ):
+            self._reject(self._too_large_error())
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+
+        self.received += len(raw_data)
+
+        if self.received > settings.PROFILE_PICTURE_MAX_UPLOAD_SIZE:
+            self._reject(self._too_large_error())
+
+        if not self.header_checked:
+            self.header += raw_data
+            self._check_header()
+
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.active and not self.header_checked:
+            # the whole file was smaller than the header Pillow needed
+            self._reject('Upload a valid image file.')
+
+        # the file itself is built by the next handler
+        return None
+
+    def _check_header(self):
+        if len(self.header) < self.MAGIC_NUMBER_LENGTH:
+            return
+
+        if not any(self.header.startswith(magic) for magic in self.MAGIC_NUMBERS):
+            self._reject('Only JPEG and PNG images are allowed.')
+
+        # imported on first use, most processes never handle an upload
+        from PIL import Image, UnidentifiedImageError
+
+        try:
+            # Image.open() only parses the header, the pixel data is never decoded
+            with Image.open(BytesIO(self.header)) as image:
+                width, height = image.size
+                image_format = image.format
+
+        except Image.DecompressionBombError:
+            self._reject('Image dimensions are too large.')
+
+        except (UnidentifiedImageError, OSError, SyntaxError):
+            # the header is not complete yet
+            if len(self.header) >= self.MAX_HEADER_SIZE:
+                self._reject('Upload a valid image file.')
+            return
+
+        if image_format not in self.MAGIC_NUMBERS.values():
+            self._reject('Only JPEG and PNG images are allowed.')
+
+        if width * height > settings.PROFILE_PICTURE_MAX_PIXELS:
+            self._reject('Image dimensions are too large.')
+
+        self.header_checked = True
+        self.header = b''
+
+    def _reject(self, error):
+        self.error = error
+        # don't read the rest of the request body
+        raise StopUpload(connection_reset=True)
+
+    @staticmethod
+    def _too_large_error():
+        max_size_mb = settings.PROFILE_PICTURE_MAX_UPLOAD_SIZE / (1024 * 1024)
+        return f'Image size must not exceed {max_size_mb:g} MB.'
@@ -1,6 +1,10 @@
 from django.urls import path
 
 from users.api import (
+    create_data_export,
+    download_data_export,
+    export_user_data,
+    get_data_export,
     home_page,
     register,
     logout,
@@ -26,4 +30,12 @@ urlpatterns = [
         get_user_likes_and_posts,
         name='get_total_posts_and_post_likes',
     ),
+    path('users/export/', export_user_data, name='export_user_data'),
+    path('users/exports/', create_data_export, name='create_data_export'),
+    path('users/exports/<int:export_id>/', get_data_export, name='get_data_export'),
+    path(
+        'users/exports/<int:export_id>/file/',
+        download_data_export,
+        name='download_data_export',
+    ),
 ]